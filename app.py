@@ -12,7 +12,7 @@ st.set_page_config(
 # --- Sidebar ---
 st.sidebar.title("Navigation")
 # Added "Email Validator" to the options
-app_mode = st.sidebar.radio("Go to", ["Email Permutator & Verifier", "Cold Email Drafter", "Email Validator"])
+app_mode = st.sidebar.radio("Go to", ["Email Permutator & Verifier", "Cold Email Drafter", "Email Validator", "Background Jobs"])
 
 st.sidebar.divider()
 st.sidebar.subheader("LLM Configuration")
@@ -51,3 +51,6 @@ elif app_mode == "Cold Email Drafter":
 
 elif app_mode == "Email Validator":
     views.render_email_validator()
+
+elif app_mode == "Background Jobs":
+    views.render_jobs()
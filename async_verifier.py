@@ -0,0 +1,398 @@
+import asyncio
+import socket
+import time
+
+import mx_health
+import rate_limit
+import timing
+import utils
+
+logger = utils.logger
+
+MAX_RCPT_PER_SESSION = 50  # reconnect after this many addresses to stay under server limits
+
+
+class _AsyncSMTP:
+    """Minimal SMTP client over asyncio streams, enough for a HELO/MAIL/RCPT dialogue."""
+
+    def __init__(self, timeout=None):
+        self.timeout = utils.SMTP_TIMEOUT if timeout is None else timeout
+        self.reader = None
+        self.writer = None
+        self.connected_at = None
+
+    async def connect(self, host, port=None):
+        port = utils.SMTP_PORT if port is None else port
+        self.reader, self.writer = await self._wait(asyncio.open_connection(host, port))
+        self.connected_at = time.perf_counter()
+        return await self.getreply()
+
+    async def getreply(self):
+        lines = []
+        while True:
+            line = await self._wait(self.reader.readline())
+            if not line:
+                raise ConnectionResetError("Connection unexpectedly closed")
+            lines.append(line[4:].strip())
+            if line[3:4] != b"-":
+                break
+        try:
+            code = int(line[:3])
+        except ValueError:
+            code = -1
+        return code, b"\n".join(lines)
+
+    async def command(self, line):
+        self.writer.write(f"{line}\r\n".encode())
+        await self._wait(self.writer.drain())
+        return await self.getreply()
+
+    async def helo(self, name):
+        return await self.command(f"HELO {name}")
+
+    async def mail(self, sender):
+        return await self.command(f"MAIL FROM:<{sender}>")
+
+    async def rcpt(self, recipient):
+        return await self.command(f"RCPT TO:<{recipient}>")
+
+    async def rset(self):
+        return await self.command("RSET")
+
+    async def quit(self):
+        try:
+            await self.command("QUIT")
+        except Exception:
+            pass
+        self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def _wait(self, aw):
+        try:
+            return await asyncio.wait_for(aw, self.timeout)
+        except asyncio.TimeoutError:
+            # Surface as socket.timeout so utils maps it to "Unknown (Timeout)"
+            raise socket.timeout("timed out")
+
+
+async def resolve_cached_async(name, rdtype):
+    """Async counterpart of utils.resolve_cached, sharing the same TTL cache."""
+    answer = utils._dns_cache_get(name, rdtype)
+    if answer is not None:
+        return answer
+
+    import dns.asyncresolver
+    import dns.resolver
+    try:
+        answer = await dns.asyncresolver.resolve(name, rdtype)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+        utils._dns_cache_put(name, rdtype, e)
+        raise
+    return utils._dns_cache_put(name, rdtype, answer)
+
+
+async def get_mx_record_async(domain):
+    try:
+        return utils._primary_mx(await resolve_cached_async(domain, 'MX'))
+    except Exception as e:
+        logger.error(f"DNS Lookup failed for {domain}: {e}")
+        return None
+
+
+async def get_mx_records_async(domain):
+    try:
+        return utils._mx_hosts(await resolve_cached_async(domain, 'MX'))
+    except Exception as e:
+        logger.error(f"DNS Lookup failed for {domain}: {e}")
+        return []
+
+
+async def check_dns_txt_async(domain, prefix):
+    try:
+        return utils._has_txt_prefix(await resolve_cached_async(domain, 'TXT'), prefix)
+    except Exception:
+        return False
+
+
+class AsyncVerifier:
+    """
+    Verify many addresses concurrently.
+    `concurrency` caps open SMTP sessions overall, `per_mx_limit` caps them per MX host.
+    Each session handles a queue of addresses for its MX, with RSET between them.
+    """
+
+    def __init__(self, sender_email="test@example.com", concurrency=100, per_mx_limit=3,
+                 on_result=None, store=None, dns_info=None):
+        self.sender_email = sender_email
+        self.store = store
+        self.dns_info = dns_info or {}
+        self.concurrency = concurrency
+        self.per_mx_limit = per_mx_limit
+        self.on_result = on_result
+        self.local_hostname = socket.getfqdn() or 'localhost'
+        self._domain_tasks = {}
+        self._dns_seconds = {}
+        self._catch_all_locks = {}
+        self._catch_all_unknown = {}
+
+    async def verify(self, emails):
+        """Returns: Dict mapping each email to the same details dict as utils.verify_email_smtp."""
+        self._global = asyncio.Semaphore(self.concurrency)
+        results = {}
+        by_mx = {}
+
+        unique = list(dict.fromkeys(emails))
+        if self.store is not None:
+            cached = self.store.get_many(unique)
+            for email, details in cached.items():
+                results[email] = details
+                self._done(email, details)
+            unique = [e for e in unique if e not in cached]
+
+        infos = await asyncio.gather(*(self._domain_info(e.split('@')[-1]) for e in unique))
+
+        for email, (mx_record, has_spf, has_dmarc) in zip(unique, infos):
+            details = utils._base_details(email, mx_record, has_spf, has_dmarc)
+            # A domain's lookup time is charged to its first address
+            dns_seconds = self._dns_seconds.pop(email.split('@')[-1], None)
+            details["timings"] = {} if dns_seconds is None else {"dns": dns_seconds}
+            results[email] = details
+            if not mx_record:
+                details["status"] = "Unknown (No MX)"
+                details["reason"] = "No MX records found for domain."
+                self._done(email, details)
+            elif utils.get_cached_catch_all(email.split('@')[-1], mx_record):
+                utils._apply_rcpt_result(details, 250, True)
+                self._done(email, details)
+            else:
+                by_mx.setdefault(mx_record, []).append(email)
+
+        # Backup MX hosts to fail over to, from the first domain on each primary
+        groups = list(by_mx.items())
+        backups = await asyncio.gather(*(get_mx_records_async(e[0].split('@')[-1]) for _, e in groups))
+
+        workers = []
+        for (mx_record, mx_emails), others in zip(groups, backups):
+            hosts = [mx_record] + [h for h in others if h.lower() != mx_record.lower()]
+            queue = asyncio.Queue()
+            for email in mx_emails:
+                queue.put_nowait(email)
+            for _ in range(min(self.per_mx_limit, len(mx_emails))):
+                workers.append(self._mx_worker(hosts, queue, results))
+        await asyncio.gather(*workers)
+
+        if self.store is not None:
+            self.store.save_many({e: results[e] for e in unique})
+
+        return results
+
+    def _domain_info(self, domain):
+        # One in-flight lookup per domain, however many addresses share it
+        task = self._domain_tasks.get(domain)
+        if task is None and domain.lower() in self.dns_info:
+            # Resolved ahead of time (utils.preresolve_domains)
+            task = asyncio.get_running_loop().create_future()
+            task.set_result(self.dns_info[domain.lower()])
+            self._domain_tasks[domain] = task
+        elif task is None:
+            task = asyncio.ensure_future(self._resolve(domain))
+            self._domain_tasks[domain] = task
+        return task
+
+    async def _resolve(self, domain):
+        started = time.perf_counter()
+        info = await asyncio.gather(
+            get_mx_record_async(domain),
+            check_dns_txt_async(domain, "v=spf1"),
+            check_dns_txt_async(f"_dmarc.{domain}", "v=DMARC1"),
+        )
+        self._dns_seconds[domain] = time.perf_counter() - started
+        return info
+
+    def _done(self, email, details):
+        if self.on_result is not None:
+            self.on_result(email, details)
+
+    async def _mx_worker(self, hosts, queue, results):
+        session = None
+        host = None
+        banner = None
+        handled = 0
+        try:
+            while not queue.empty():
+                email = queue.get_nowait()
+                details = results[email]
+                try:
+                    if session is not None and handled >= MAX_RCPT_PER_SESSION:
+                        await self._close(session)
+                        session = None
+                    if session is None:
+                        # Session setup is timed on the address that opened it
+                        session, host, code, banner = await self._open(hosts, details["timings"])
+                        handled = 0
+                        details["mx_record"] = host
+                        if code != 220:
+                            await self._close(session)
+                            session = None
+                            details["smtp_banner"] = str(banner)
+                            utils._apply_connect_fail(details, code)
+                            self._done(email, details)
+                            continue
+                    details["mx_record"] = host
+                    details["smtp_banner"] = str(banner)
+                    await self._check(session, host, email, details)
+                    handled += 1
+                except Exception as e:
+                    if session is not None:
+                        utils._record_dialogue_error(host, e)
+                    utils._apply_smtp_error(details, email, e)
+                    if session is not None:
+                        await self._close(session, graceful=False)
+                        session = None
+                self._done(email, details)
+        finally:
+            if session is not None:
+                await self._close(session)
+
+    async def _open(self, hosts, timings):
+        """
+        Take a global session slot and connect to the first healthy host, failing over
+        like utils._connect_smtp. The slot is released by _close.
+        Returns: (session, host, code, banner)
+        """
+        await self._global.acquire()
+        try:
+            return await self._connect(hosts, timings)
+        except BaseException:
+            self._global.release()
+            raise
+
+    async def _connect(self, hosts, timings):
+        refused = None
+        error = None
+        for host in hosts:
+            if not mx_health.tracker.allow(host):
+                continue
+            with timing.span(timings, "throttle"):
+                await asyncio.sleep(rate_limit.limiter.reserve(host))
+            session = _AsyncSMTP()
+            started = time.perf_counter()
+            try:
+                code, banner = await session.connect(host)
+            except OSError as e:
+                timing.add_connect(timings, started, session.connected_at, time.perf_counter())
+                mx_health.tracker.record_failure(host, "timeout" if isinstance(e, socket.timeout) else "connect")
+                session.close()
+                error = e
+                continue
+            except BaseException:
+                session.close()
+                raise
+            latency = time.perf_counter() - started
+            timing.add_connect(timings, started, session.connected_at, started + latency)
+            rate_limit.limiter.record_latency(host, latency)
+            rate_limit.limiter.record_reply(host, code)
+            if refused is not None:
+                refused[0].close()
+            if code == 220:
+                mx_health.tracker.record_success(host, latency)
+                try:
+                    with timing.span(timings, "helo"):
+                        await session.helo(self.local_hostname)
+                except BaseException:
+                    session.close()
+                    raise
+                return session, host, code, banner
+            mx_health.tracker.record_failure(host)
+            refused = (session, host, code, banner)
+
+        if refused is not None:
+            return refused
+        if error is not None:
+            raise error
+        raise mx_health.MXUnavailable(hosts)
+
+    async def _close(self, session, graceful=True):
+        try:
+            if graceful:
+                await session.quit()
+            else:
+                session.close()
+        finally:
+            self._global.release()
+
+    async def _check(self, session, mx_record, email, details):
+        domain = email.split('@')[-1]
+        timings = details["timings"]
+        # Settle Catch-All first, as utils._verify_session does, so known
+        # catch-all domains skip the per-address RCPT
+        catch_all, probe_code = await self._catch_all(session, domain, mx_record, timings)
+        if catch_all:
+            utils._apply_rcpt_result(details, 250, True)
+            return
+        await self._mail(session, timings)
+        code, _ = await self._rcpt(session, mx_record, email, timings)
+        if code == 250 and catch_all is None:
+            utils._apply_catch_all_unknown(details, probe_code)
+            return
+        utils._apply_rcpt_result(details, code, False)
+
+    async def _mail(self, session, timings):
+        with timing.span(timings, "mail"):
+            await session.rset()
+            await session.mail(self.sender_email)
+
+    async def _rcpt(self, session, mx_record, address, timings):
+        # Same provider rate limiter as utils._rcpt
+        with timing.span(timings, "throttle"):
+            await asyncio.sleep(rate_limit.limiter.reserve(mx_record))
+        with timing.span(timings, "rcpt"):
+            code, message = await session.rcpt(address)
+        rate_limit.limiter.record_reply(mx_record, code)
+        return code, message
+
+    async def _catch_all(self, session, domain, mx_record, timings):
+        """
+        Probe once per (domain, MX); concurrent sessions wait for the first probe.
+        Only definite answers are cached, as in utils._probe_catch_all; a
+        temporary reply is remembered for this run only.
+        Returns: (True/False, or None for a temporary reply, probe reply code or None if cached)
+        """
+        key = (domain, mx_record)
+        lock = self._catch_all_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = utils.get_cached_catch_all(domain, mx_record)
+            if cached is not None:
+                return cached, None
+            if key in self._catch_all_unknown:
+                return None, self._catch_all_unknown[key]
+            await self._mail(session, timings)
+            code, _ = await self._rcpt(session, mx_record, utils.catch_all_probe_address(domain, mx_record),
+                                       timings)
+            result = utils.catch_all_from_code(code)
+            if result is None:
+                self._catch_all_unknown[key] = code
+            else:
+                utils._set_cached_catch_all(domain, mx_record, result)
+            return result, code
+
+
+async def verify_emails_async(emails, sender_email="test@example.com", concurrency=100,
+                              per_mx_limit=3, on_result=None, store=None, dns_info=None):
+    """
+    Verify emails concurrently with asyncio DNS and SMTP.
+    Returns: Dict mapping each email to the same details dict as utils.verify_email_smtp.
+    """
+    verifier = AsyncVerifier(sender_email, concurrency, per_mx_limit, on_result, store, dns_info)
+    return await verifier.verify(emails)
+
+
+def verify_emails_concurrent(emails, sender_email="test@example.com", concurrency=100,
+                             per_mx_limit=3, on_result=None, store=None, dns_info=None):
+    """Blocking wrapper around verify_emails_async for scripts and Streamlit views."""
+    return asyncio.run(verify_emails_async(emails, sender_email, concurrency, per_mx_limit,
+                                           on_result, store, dns_info))
@@ -0,0 +1,68 @@
+"""
+Regression check against smtp_bench's fake greylisting server: a deliverable address
+whose host defers every new (sender, recipient) pair must come back Valid once retried,
+on the blocking path and on the bulk (asyncio) path with the retry scheduler.
+
+    python benchmarks/greylist_check.py
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+import greylist  # noqa: E402
+import pipeline  # noqa: E402
+import rate_limit  # noqa: E402
+import utils  # noqa: E402
+from smtp_bench import FakeSMTP, StubResolver, reset_state  # noqa: E402
+
+DOMAIN = "greylist.test"
+
+
+def check_blocking():
+    # The first call is deferred (address and catch-all probe); the second reuses both triplets
+    first = utils.verify_email_smtp(f"ok1@{DOMAIN}")["status"]
+    second = utils.verify_email_smtp(f"ok1@{DOMAIN}")["status"]
+    return first.startswith("Unknown") and second == "Valid", f"{first} -> {second}"
+
+
+def check_bulk():
+    retry = greylist.RetryScheduler(base_delay=0.1)
+    rows = pipeline.verify_email_chunk(pd.DataFrame({"email": [f"ok2@{DOMAIN}", f"no2@{DOMAIN}"]}),
+                                       "email", retry=retry)
+    rows += pipeline.retry_email_rows(retry, wait=True)
+    statuses = {row["Email"]: row["Status"] for row in rows}
+    expected = {f"ok2@{DOMAIN}": "Valid", f"no2@{DOMAIN}": "Invalid"}
+    return statuses == expected, str(statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=2525)
+    args = parser.parse_args()
+
+    utils.SMTP_PORT = args.port
+    utils.logger.setLevel("CRITICAL")
+    rate_limit.limiter = rate_limit.ProviderRateLimiter(default=(1e9, 10 ** 9))
+    server = FakeSMTP(args.port)
+    server.start()
+    StubResolver({DOMAIN: server.host_for("greylist")}).install()
+
+    failed = 0
+    for name, check in [("blocking", check_blocking), ("bulk", check_bulk)]:
+        reset_state()
+        server.reset()
+        ok, detail = check()
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<10}{detail}")
+    server.stop()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
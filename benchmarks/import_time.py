@@ -0,0 +1,70 @@
+"""
+Import-time benchmark for the app's modules.
+
+Each module is imported in a fresh interpreter, several times, and the median
+wall time is reported along with which heavy dependencies got loaded.
+Pass --baseline REV to measure an older revision side by side, e.g.
+
+    python benchmarks/import_time.py --baseline HEAD~1
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["utils", "async_verifier", "pipeline", "cli", "views"]
+HEAVY = ["streamlit", "langchain_core", "langchain_openai", "pypdf", "dns.resolver", "pandas", "pyarrow"]
+
+_PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def measure(tree, module, runs):
+    """Returns: (median seconds, heavy modules loaded) for importing module from tree."""
+    times = []
+    loaded = ""
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY)],
+            cwd=tree, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        times.append(float(out[0]))
+        loaded = out[1] if len(out) > 1 else ""
+    return statistics.median(times), loaded
+
+
+def export_revision(rev, dest):
+    archive = subprocess.run(["git", "archive", rev], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", help="Git revision to compare against.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as baseline_tree:
+        if args.baseline:
+            export_revision(args.baseline, baseline_tree)
+
+        print(f"{'module':<16}{'baseline':>10}{'current':>10}  loaded (current)")
+        for module in args.modules:
+            before = "-"
+            if args.baseline and os.path.exists(os.path.join(baseline_tree, f"{module}.py")):
+                before = f"{measure(baseline_tree, module, args.runs)[0]:.3f}s"
+            current, loaded = measure(ROOT, module, args.runs)
+            print(f"{module:<16}{before:>10}{current:>9.3f}s  {loaded or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Offline verification benchmark: local fake SMTP servers plus a stub DNS resolver,
+so throughput can be measured without touching real mail servers.
+
+Every server behaviour listens on its own loopback address (127.0.0.2, .3, ...) on
+one port, and the stub resolver points each synthetic domain's MX at one of them.
+
+    python benchmarks/smtp_bench.py --addresses 10000 --domains 500
+    python benchmarks/smtp_bench.py --scenario bulk --addresses 100000 --timeout 1
+    python benchmarks/smtp_bench.py --mix normal=80,greylist=20 --rate-limit
+
+Scenarios:
+    single      utils.verify_email_smtp per address (on --threads threads)
+    catch_all   utils.is_catch_all once per domain
+    bulk        the Email Validator's bulk path: DNS pre-pass, then pipeline.verify_email_chunk;
+                p50/p99 are per probed address, summed from its stage timings
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dns.asyncresolver  # noqa: E402
+import dns.name  # noqa: E402
+import dns.resolver  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import mx_health  # noqa: E402
+import pipeline  # noqa: E402
+import rate_limit  # noqa: E402
+import utils  # noqa: E402
+
+BEHAVIOURS = ["normal", "accept_all", "reject", "greylist", "slow_banner", "timeout"]
+DEFAULT_MIX = "normal=60,accept_all=15,reject=10,greylist=10,slow_banner=4,timeout=1"
+
+
+class FakeSMTP:
+    """
+    asyncio SMTP stand-in on its own event loop thread. Behaviours:
+      normal       RCPT 250 for local parts starting with "ok", else 550
+      accept_all   RCPT 250 for everything (catch-all)
+      reject       RCPT 550 for everything
+      greylist     first RCPT per address 451, later ones as normal
+      slow_banner  greeting delayed by slow_delay seconds, then as normal
+      timeout      accepts the connection and never answers
+    """
+
+    def __init__(self, port, slow_delay=0.5):
+        self.port = port
+        self.slow_delay = slow_delay
+        self.connections = Counter()
+        self.rcpts = Counter()
+        self._greylisted = set()
+        self._loop = asyncio.new_event_loop()
+        self._servers = []
+
+    def host_for(self, behaviour):
+        return f"127.0.0.{BEHAVIOURS.index(behaviour) + 2}"
+
+    def start(self):
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        for behaviour in BEHAVIOURS:
+            asyncio.run_coroutine_threadsafe(self._listen(behaviour), self._loop).result()
+
+    async def _listen(self, behaviour):
+        async def handle(reader, writer):
+            await self._session(behaviour, reader, writer)
+        self._servers.append(await asyncio.start_server(
+            handle, self.host_for(behaviour), self.port, reuse_address=True, backlog=4096
+        ))
+
+    async def _session(self, behaviour, reader, writer):
+        self.connections[behaviour] += 1
+        try:
+            if behaviour == "timeout":
+                await reader.read()  # hold the socket open until the client gives up
+                return
+            if behaviour == "slow_banner":
+                await asyncio.sleep(self.slow_delay)
+            writer.write(b"220 fake.test ESMTP\r\n")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode(errors="replace").strip()
+                verb = command[:4].upper()
+                if verb in ("HELO", "EHLO", "MAIL", "RSET", "NOOP"):
+                    writer.write(b"250 OK\r\n")
+                elif verb == "RCPT":
+                    self.rcpts[behaviour] += 1
+                    address = command.split(":", 1)[1].strip().strip("<>").lower()
+                    writer.write(self._rcpt_reply(behaviour, address))
+                elif verb == "QUIT":
+                    writer.write(b"221 Bye\r\n")
+                    await writer.drain()
+                    return
+                else:
+                    writer.write(b"502 Not implemented\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def reset(self):
+        """Clear counters and greylist memory between scenarios."""
+        self.connections.clear()
+        self.rcpts.clear()
+        self._greylisted.clear()
+
+    def _rcpt_reply(self, behaviour, address):
+        if behaviour == "accept_all":
+            return b"250 OK\r\n"
+        if behaviour == "reject":
+            return b"550 No such user\r\n"
+        if behaviour == "greylist" and address not in self._greylisted:
+            self._greylisted.add(address)
+            return b"451 Greylisted, try again later\r\n"
+        return b"250 OK\r\n" if address.startswith("ok") else b"550 No such user\r\n"
+
+    def stop(self):
+        for server in self._servers:
+            self._loop.call_soon_threadsafe(server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class _Answer(list):
+    """Just enough of dns.resolver.Answer for utils: iterable rdata plus rrset.ttl."""
+
+    class _RRset:
+        ttl = 3600
+
+    rrset = _RRset()
+
+
+class _MX:
+    def __init__(self, preference, host):
+        self.preference = preference
+        self.exchange = dns.name.from_text(host)
+
+
+class _TXT:
+    def __init__(self, text):
+        self._text = text
+
+    def to_text(self):
+        return f'"{self._text}"'
+
+
+class StubResolver:
+    """Replaces dns.resolver.resolve and dns.asyncresolver.resolve with a zone dict."""
+
+    def __init__(self, zones, latency=0.0):
+        self.zones = zones  # {domain: mx host}
+        self.latency = latency
+        self.queries = 0
+
+    def _answer(self, name, rdtype):
+        self.queries += 1
+        name = str(name).lower().rstrip('.')
+        if rdtype == 'MX' and name in self.zones:
+            return _Answer([_MX(10, self.zones[name])])
+        if rdtype == 'TXT' and name in self.zones:
+            return _Answer([_TXT("v=spf1 -all")])
+        raise dns.resolver.NXDOMAIN()
+
+    def resolve(self, name, rdtype, *args, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(name, rdtype)
+
+    async def resolve_async(self, name, rdtype, *args, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(name, rdtype)
+
+    def install(self):
+        dns.resolver.resolve = self.resolve
+        dns.asyncresolver.resolve = self.resolve_async
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in BEHAVIOURS:
+            raise SystemExit(f"Unknown behaviour '{name}'; choose from {', '.join(BEHAVIOURS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def synthetic_list(addresses, domains, mix, server, seed=0):
+    """
+    Returns: (emails, zones) - addresses spread over domains whose MX behaviours follow
+    the mix weights; a quarter of local parts start with "ok" (deliverable on normal hosts).
+    """
+    rng = random.Random(seed)
+    names = list(mix)
+    behaviours = rng.choices(names, weights=[mix[n] for n in names], k=domains)
+    zones = {f"d{i}.bench.test": server.host_for(b) for i, b in enumerate(behaviours)}
+    domain_names = list(zones)
+    emails = [
+        f"{'ok' if rng.random() < 0.25 else 'no'}{i}@{rng.choice(domain_names)}"
+        for i in range(addresses)
+    ]
+    return emails, zones
+
+
+def reset_state():
+    utils.clear_dns_cache()
+    utils.clear_catch_all_cache()
+    mx_health.tracker.reset()
+    rate_limit.limiter.reset()
+
+
+def run_single(emails, zones, args):
+    latencies = []
+    statuses = Counter()
+
+    def check(email):
+        started = time.perf_counter()
+        details = utils.verify_email_smtp(email)
+        return time.perf_counter() - started, details["status"]
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for latency, status in executor.map(check, emails):
+            latencies.append(latency)
+            statuses[status] += 1
+    return len(emails), latencies, statuses
+
+
+def run_catch_all(emails, zones, args):
+    latencies = []
+    statuses = Counter()
+
+    def check(domain):
+        started = time.perf_counter()
+        result = utils.is_catch_all(domain, zones[domain])
+        label = "Unknown" if result is None else "Catch-All" if result else "Not Catch-All"
+        return time.perf_counter() - started, label
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for latency, status in executor.map(check, list(zones)):
+            latencies.append(latency)
+            statuses[status] += 1
+    return len(zones), latencies, statuses
+
+
+def run_bulk(emails, zones, args):
+    # Same steps as the Email Validator's CSV tab: DNS pre-pass, then concurrent chunks
+    latencies = []
+    statuses = Counter()
+    dns_info = utils.preresolve_domains({e.split('@')[-1] for e in emails})
+    df = pd.DataFrame({"email": emails})
+    for start in range(0, len(df), args.chunk_size):
+        chunk = df.iloc[start:start + args.chunk_size]
+
+        def on_result(email, details):
+            # Per-address latency from its own stage timings (DNS, throttle, connect, banner,
+            # MAIL, RCPT), not time since the chunk started, which would measure queueing
+            if details.get("timings"):
+                latencies.append(sum(details["timings"].values()))
+
+        rows = pipeline.verify_email_chunk(chunk, "email", on_result=on_result, dns_info=dns_info,
+                                           concurrency=args.concurrency, per_mx_limit=args.per_mx_limit)
+        statuses.update(row["Status"] for row in rows)
+    return len(emails), latencies, statuses
+
+
+SCENARIOS = {"single": run_single, "catch_all": run_catch_all, "bulk": run_bulk}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--addresses", type=int, default=1000)
+    parser.add_argument("--domains", type=int, default=100)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Behaviour weights per domain.")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--timeout", type=float, default=1.0, help="SMTP timeout in seconds.")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="Banner delay of slow_banner hosts.")
+    parser.add_argument("--dns-latency", type=float, default=0.0, help="Simulated seconds per DNS query.")
+    parser.add_argument("--threads", type=int, default=16, help="Caller threads for single/catch_all.")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--per-mx-limit", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=pipeline.CHUNK_SIZE)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Keep the per-provider SMTP rate limiter on (off by default to measure the engine).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    utils.SMTP_PORT = args.port
+    utils.SMTP_TIMEOUT = args.timeout
+    utils.logger.setLevel("CRITICAL")
+    if not args.rate_limit:
+        rate_limit.limiter = rate_limit.ProviderRateLimiter(default=(1e9, 10 ** 9))
+
+    server = FakeSMTP(args.port, args.slow_delay)
+    server.start()
+    emails, zones = synthetic_list(args.addresses, args.domains, parse_mix(args.mix), server, args.seed)
+    resolver = StubResolver(zones, args.dns_latency)
+    resolver.install()
+
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    print(f"{len(emails)} addresses over {len(zones)} domains, mix {args.mix}")
+    print(f"{'scenario':<10}{'items':>8}{'seconds':>9}{'items/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'conns':>8}{'rcpts':>8}{'dns q':>7}  statuses")
+    for name in scenarios:
+        reset_state()
+        server.reset()
+        resolver.queries = 0
+        started = time.perf_counter()
+        items, latencies, statuses = SCENARIOS[name](emails, zones, args)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<10}{items:>8}{elapsed:>9.2f}{items / elapsed:>10.1f}"
+              f"{statistics.median(latencies) * 1000 if latencies else 0:>9.1f}"
+              f"{percentile(latencies, 0.99) * 1000:>9.1f}"
+              f"{sum(server.connections.values()):>8}{sum(server.rcpts.values()):>8}{resolver.queries:>7}"
+              f"  {dict(statuses.most_common())}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Headless batch verification, for cron jobs and worker nodes.
+Imports no Streamlit or LLM code.
+
+    python cli.py verify emails.csv -o results.csv --concurrency 200
+    python cli.py find people.csv --all > results.csv
+    cat emails.csv | python -m cli verify - --email-column work_email
+
+Sharded across processes (one box) or machines sharing a spool file (the filesystem
+must support file locking; see spool.py):
+
+    python cli.py verify emails.csv -o results.csv --processes 8
+    python cli.py enqueue emails.csv --spool job.db
+    python cli.py worker --spool job.db          # on every machine, as often as wanted
+    python cli.py merge --spool job.db -o results.csv
+"""
+import argparse
+import csv
+import functools
+import logging
+import os
+import sys
+import uuid
+
+import pandas as pd
+
+import greylist
+import pipeline
+import spool
+import store
+import utils
+
+
+class _StdoutWriter:
+    """ResultWriter stand-in that streams CSV rows to stdout."""
+
+    def __init__(self):
+        self._csv = None
+        self.rows_written = 0
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self._csv is None:
+            self._csv = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]), extrasaction="ignore")
+            self._csv.writeheader()
+        self._csv.writerows(rows)
+        sys.stdout.flush()
+        self.rows_written += len(rows)
+
+    def close(self):
+        pass
+
+
+def _open_writer(args):
+    if args.output == "-":
+        if args.format != "csv":
+            raise SystemExit("Only CSV output can be streamed to stdout; pass -o for Parquet.")
+        return _StdoutWriter()
+    return pipeline.ResultWriter(fmt=args.format, path=args.output)
+
+
+def _read_chunks(args):
+    """Stream the input in chunks; '-' reads stdin, so nothing needs to fit in memory."""
+    source = sys.stdin if args.input == "-" else args.input
+    for chunk in pd.read_csv(source, chunksize=args.chunk_size):
+        chunk.columns = pipeline.normalize_columns(chunk.columns)
+        yield chunk
+
+
+def _preresolve(values, dns_info, workers):
+    # DNS pre-pass per chunk, so stdin input streams too; domains seen before are skipped
+    domains = pipeline.domains_to_resolve(values)
+    dns_info.update(utils.preresolve_domains(domains - set(dns_info), workers))
+
+
+def run_verify(args):
+    if args.processes > 1:
+        return run_sharded(args)
+    result_store = None if args.no_store else store.ResultStore(args.db)
+    retry = greylist.RetryScheduler() if args.retry_greylisted else None
+    email_col = args.email_column.strip().lower().replace(' ', '_')
+    dns_info = {}
+    rows_done = 0
+
+    def verify_chunk(chunk):
+        chunk.index = range(rows_done, rows_done + len(chunk))
+        if email_col not in chunk.columns:
+            raise SystemExit(f"Column '{args.email_column}' not found in input.")
+        _preresolve(chunk[email_col], dns_info, args.dns_workers)
+        return pipeline.verify_email_chunk(
+            chunk, email_col, result_store, dns_info=dns_info, retry=retry,
+            concurrency=args.concurrency, per_mx_limit=args.per_mx_limit
+        )
+
+    def log_progress(chunk):
+        nonlocal rows_done
+        if chunk is not None:
+            rows_done += len(chunk)
+            utils.logger.info(f"{rows_done} rows verified")
+
+    writer = _open_writer(args)
+    try:
+        pipeline.process_chunks(
+            _read_chunks(args), verify_chunk, writer, retry,
+            functools.partial(pipeline.retry_email_rows, retry, result_store, dns_info,
+                              concurrency=args.concurrency, per_mx_limit=args.per_mx_limit),
+            after_write=log_progress,
+            on_drain=lambda pending: utils.logger.info(f"Waiting to retry {pending} greylisted rows")
+        )
+    finally:
+        writer.close()
+        if result_store is not None:
+            result_store.close()
+    return 0
+
+
+def _worker_args(args):
+    return {
+        "concurrency": args.concurrency,
+        "per_mx_limit": args.per_mx_limit,
+        "db": None if args.no_store else args.db,
+        "retry_greylisted": args.retry_greylisted,
+    }
+
+
+def run_sharded(args):
+    # enqueue + a local worker pool + merge, through a throwaway spool
+    os.makedirs(pipeline.OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(pipeline.OUTPUT_DIR, f"spool_{uuid.uuid4().hex[:8]}.db")
+    job = spool.Spool(path)
+    try:
+        email_col = args.email_column.strip().lower().replace(' ', '_')
+        try:
+            rows = job.enqueue(_read_chunks(args), email_col, args.dns_workers)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        utils.logger.info(f"{rows} rows in {sum(job.progress()['shards'].values())} shards, "
+                          f"{args.processes} worker processes")
+        spool.run_local(path, args.processes, **_worker_args(args))
+        writer = _open_writer(args)
+        try:
+            job.export(writer)
+        finally:
+            writer.close()
+    finally:
+        job.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return 0
+
+
+def run_enqueue(args):
+    job = spool.Spool(args.spool)
+    try:
+        rows = job.enqueue(_read_chunks(args), args.email_column.strip().lower().replace(' ', '_'),
+                           args.dns_workers)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        job.close()
+    utils.logger.info(f"Enqueued {rows} rows into {args.spool}")
+    return 0
+
+
+def run_worker(args):
+    rows = spool.run_worker(args.spool, **_worker_args(args))
+    utils.logger.info(f"Worker done, {rows} rows verified")
+    return 0
+
+
+def run_merge(args):
+    job = spool.Spool(args.spool)
+    try:
+        progress = job.progress()
+        if job.unfinished() and not args.partial:
+            raise SystemExit(f"{job.unfinished()} shards are not done yet "
+                             f"({progress['rows_done']} / {progress['rows']} rows); pass --partial to merge anyway.")
+        writer = _open_writer(args)
+        try:
+            job.export(writer)
+        finally:
+            writer.close()
+    finally:
+        job.close()
+    return 0
+
+
+def run_find(args):
+    result_store = None if args.no_store else store.ResultStore(args.db)
+    retry = greylist.RetryScheduler() if args.retry_greylisted else None
+    find_mode = not args.all
+    pattern_model = None if args.no_predict else utils.DomainPatternModel(store=result_store)
+    dns_info = {}
+    rows_done = 0
+
+    def verify_chunk(chunk):
+        chunk.index = range(rows_done, rows_done + len(chunk))
+        missing = {'first_name', 'last_name', 'company_domain'} - set(chunk.columns)
+        if missing:
+            raise SystemExit(f"Input is missing columns: {', '.join(sorted(missing))}")
+        _preresolve(chunk['company_domain'], dns_info, args.dns_workers)
+        return pipeline.verify_people_chunk(
+            chunk, find_mode, pattern_model, result_store, dns_info=dns_info, retry=retry
+        )
+
+    def log_progress(chunk):
+        nonlocal rows_done
+        if chunk is not None:
+            rows_done += len(chunk)
+            utils.logger.info(f"{rows_done} people processed")
+
+    writer = _open_writer(args)
+    try:
+        pipeline.process_chunks(
+            _read_chunks(args), verify_chunk, writer, retry,
+            functools.partial(pipeline.retry_people_rows, retry, find_mode, pattern_model,
+                              result_store, dns_info),
+            after_write=log_progress,
+            on_drain=lambda pending: utils.logger.info(f"Waiting to retry {pending} greylisted people")
+        )
+    finally:
+        writer.close()
+        if result_store is not None:
+            result_store.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="codeforge", description="Bulk email verification without the UI.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only log warnings and errors.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_input(sub):
+        sub.add_argument("input", help="Input CSV path, or - for stdin.")
+        sub.add_argument("--chunk-size", type=int, default=pipeline.CHUNK_SIZE,
+                         help="Input rows read and written at a time.")
+        sub.add_argument("--dns-workers", type=int, default=32, help="Concurrent DNS lookups.")
+
+    def add_output(sub):
+        sub.add_argument("-o", "--output", default="-", help="Output path, or - for stdout (default).")
+        sub.add_argument("--format", choices=["csv", "parquet"], default="csv")
+
+    def add_checks(sub):
+        sub.add_argument("--db", default=store.DB_PATH, help="Result store to reuse fresh results from.")
+        sub.add_argument("--no-store", action="store_true", help="Neither read nor write the result store.")
+        sub.add_argument("--retry-greylisted", action="store_true",
+                         help="Retry temporary 4xx replies with backoff before giving up.")
+
+    def add_common(sub):
+        add_input(sub)
+        add_output(sub)
+        add_checks(sub)
+
+    def add_smtp(sub):
+        sub.add_argument("--concurrency", type=int, default=100, help="Open SMTP sessions overall (per process).")
+        sub.add_argument("--per-mx-limit", type=int, default=3, help="Open SMTP sessions per MX host.")
+
+    verify = commands.add_parser("verify", help="Verify a column of email addresses.")
+    add_common(verify)
+    add_smtp(verify)
+    verify.add_argument("--email-column", default="email")
+    verify.add_argument("--processes", type=int, default=1,
+                        help="Worker processes; above 1 the input is sharded by MX provider.")
+    verify.set_defaults(func=run_verify)
+
+    enqueue = commands.add_parser("enqueue", help="Shard a column of email addresses into a spool for workers.")
+    add_input(enqueue)
+    enqueue.add_argument("--spool", required=True, help="Spool file shared by the workers.")
+    enqueue.add_argument("--email-column", default="email")
+    enqueue.set_defaults(func=run_enqueue)
+
+    worker = commands.add_parser("worker", help="Verify shards of a spool until all are done.")
+    worker.add_argument("--spool", required=True)
+    add_checks(worker)
+    add_smtp(worker)
+    worker.set_defaults(func=run_worker)
+
+    merge = commands.add_parser("merge", help="Write a spool's results, in input order.")
+    merge.add_argument("--spool", required=True)
+    add_output(merge)
+    merge.add_argument("--partial", action="store_true", help="Merge even if shards are still running.")
+    merge.set_defaults(func=run_merge)
+
+    find = commands.add_parser("find", help="Find addresses for first_name/last_name/company_domain rows.")
+    add_common(find)
+    find.add_argument("--all", action="store_true", help="Check every permutation, not just the first hit.")
+    find.add_argument("--no-predict", action="store_true", help="Always probe instead of predicting "
+                                                               "from learned domain formats.")
+    find.set_defaults(func=run_find)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
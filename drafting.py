@@ -0,0 +1,279 @@
+import hashlib
+import sqlite3
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import rate_limit
+import resume
+import store
+import utils
+
+logger = utils.logger
+
+DEFAULT_TEMPERATURE = 0.7
+RESUME_EXTRACT_CHARS = 20000  # resume text read from the PDF before relevance compression
+DRAFT_CACHE_SIZE = 1000  # drafts kept on disk, least recently used evicted first
+BATCH_CONCURRENCY = 4  # LLM calls in flight during batch drafting
+BATCH_REQUESTS_PER_MINUTE = 60
+
+PROMPT_TEMPLATE = """
+You are a world-class cold outreach expert and copywriter.
+
+GOAL: Write a high-converting, personalized cold email to a recruiter or hiring manager at the target company.
+
+CONTEXT:
+My Resume:
+{resume_text}
+
+Target Company/Job Context:
+{company_context}
+
+INSTRUCTIONS:
+1. Analyze the resume to find the most relevant skills/experience for this specific company context.
+2. Keep the email concise (under 200 words).
+3. Use a professional but engaging tone.
+4. Focus on value proposition: matches between my skills and their needs.
+5. Include a strong Call to Action (CTA).
+6. Output ONLY the email body (and subject line).
+"""
+
+# Chains pooled per (provider, model, api key, temperature), shared across reruns and sessions
+_chains = {}
+_chains_lock = threading.Lock()
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_chain(provider, model, api_key, temperature=DEFAULT_TEMPERATURE):
+    """
+    Build the prompt | llm | parser chain once per (provider, model, key, temperature)
+    and reuse it. LangChain is imported on first use.
+    """
+    key = (provider, model, content_hash(api_key), temperature)
+    with _chains_lock:
+        chain = _chains.get(key)
+    if chain is not None:
+        return chain
+
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+    if provider == "OpenAI":
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(temperature=temperature, model_name=model, openai_api_key=api_key)
+    elif provider == "Groq":
+        from langchain_groq import ChatGroq
+        llm = ChatGroq(temperature=temperature, model_name=model, groq_api_key=api_key)
+    else:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+
+    chain = PromptTemplate.from_template(PROMPT_TEMPLATE) | llm | StrOutputParser()
+    with _chains_lock:
+        return _chains.setdefault(key, chain)
+
+
+def prompt_inputs(resume_text, company_context):
+    # Only the resume sections most relevant to this company fit the token budget
+    return {
+        "resume_text": resume.compress(resume_text, company_context),
+        "company_context": company_context,
+    }
+
+
+class DraftCache:
+    """
+    Disk-backed LRU cache of generated drafts, keyed on
+    (resume hash, context hash, provider, model, temperature).
+    Lives in the same SQLite database as the result store.
+    """
+
+    def __init__(self, path=store.DB_PATH, max_entries=DRAFT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS drafts (
+                    key TEXT PRIMARY KEY,
+                    draft TEXT NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_drafts_used_at ON drafts (used_at)")
+
+    @staticmethod
+    def key(resume_text, company_context, provider, model, temperature=DEFAULT_TEMPERATURE):
+        parts = [content_hash(resume_text), content_hash(company_context), provider, model, str(temperature)]
+        return content_hash("\x1f".join(parts))
+
+    def get(self, key):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT draft FROM drafts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE drafts SET used_at = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key, draft):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO drafts (key, draft, used_at) VALUES (?, ?, ?)",
+                               (key, draft, time.time()))
+            self._conn.execute(
+                "DELETE FROM drafts WHERE key NOT IN "
+                "(SELECT key FROM drafts ORDER BY used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM drafts")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LatencyLog:
+    """
+    Time-to-first-token and total generation time of every streamed draft, per provider
+    and model, kept in SQLite so models can be compared on real numbers over time.
+    """
+
+    def __init__(self, path=store.DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS draft_latency (
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    first_token REAL NOT NULL,
+                    total REAL NOT NULL,
+                    recorded_at REAL NOT NULL
+                )
+            """)
+
+    def record(self, provider, model, first_token, total):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO draft_latency (provider, model, first_token, total, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (provider, model, first_token, total, time.time()),
+            )
+
+    def summary(self, last=200):
+        """
+        Median and p90 latencies over each provider/model's most recent drafts.
+        Returns: List of dicts, fastest median time-to-first-token first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT provider, model, first_token, total FROM draft_latency ORDER BY recorded_at DESC"
+            ).fetchall()
+        samples = {}
+        for provider, model, first_token, total in rows:
+            runs = samples.setdefault((provider, model), [])
+            if len(runs) < last:
+                runs.append((first_token, total))
+        summary = []
+        for (provider, model), runs in samples.items():
+            first_tokens = [r[0] for r in runs]
+            totals = [r[1] for r in runs]
+            summary.append({
+                "Provider": provider,
+                "Model": model,
+                "Drafts": len(runs),
+                "TTFT p50 (s)": round(statistics.median(first_tokens), 3),
+                "TTFT p90 (s)": round(_percentile(first_tokens, 0.9), 3),
+                "Total p50 (s)": round(statistics.median(totals), 3),
+                "Total p90 (s)": round(_percentile(totals, 0.9), 3),
+            })
+        return sorted(summary, key=lambda r: r["TTFT p50 (s)"])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def stream_draft(resume_text, company_context, provider, model, api_key,
+                 temperature=DEFAULT_TEMPERATURE, cache=None, latency_log=None, refresh=False):
+    """
+    Draft a cold email, yielding it in chunks as the model generates it.
+    A cached draft is yielded whole; with refresh=True a fresh draft is generated and
+    replaces the saved one. With a LatencyLog, time-to-first-token and total
+    generation time of fresh drafts are recorded.
+    """
+    key = None
+    if cache is not None:
+        key = DraftCache.key(resume_text, company_context, provider, model, temperature)
+        draft = None if refresh else cache.get(key)
+        if draft is not None:
+            yield draft
+            return
+
+    chain = get_chain(provider, model, api_key, temperature)
+    parts = []
+    first_token = None
+    started = time.perf_counter()
+    for chunk in chain.stream(prompt_inputs(resume_text, company_context)):
+        if not chunk:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - started
+        parts.append(chunk)
+        yield chunk
+    total = time.perf_counter() - started
+
+    if latency_log is not None:
+        latency_log.record(provider, model, total if first_token is None else first_token, total)
+    if cache is not None:
+        cache.put(key, "".join(parts))
+
+
+def iter_drafts(resume_text, targets, provider, model, api_key, concurrency=BATCH_CONCURRENCY,
+                requests_per_minute=BATCH_REQUESTS_PER_MINUTE, temperature=DEFAULT_TEMPERATURE, cache=None,
+                refresh=False):
+    """
+    Draft one email per (key, company_context) in targets, concurrently over a chain built once.
+    At most `concurrency` LLM calls are in flight and at most `requests_per_minute` start per
+    minute; drafts found in the cache skip both. With refresh=True every target is drafted
+    again and the cache entries are replaced.
+    Yields: (key, draft, cached, error) as each target finishes; draft is None and error is set on failure.
+    """
+    chain = get_chain(provider, model, api_key, temperature)
+    bucket = rate_limit.TokenBucket(requests_per_minute / 60, max(concurrency, 1))
+    bucket_lock = threading.Lock()
+
+    def draft(key, company_context):
+        cache_key = None
+        if cache is not None:
+            cache_key = DraftCache.key(resume_text, company_context, provider, model, temperature)
+            cached = None if refresh else cache.get(cache_key)
+            if cached is not None:
+                return key, cached, True, None
+        with bucket_lock:
+            delay = bucket.reserve()
+        time.sleep(delay)
+        try:
+            response = chain.invoke(prompt_inputs(resume_text, company_context))
+        except Exception as e:
+            logger.error(f"Drafting failed for row {key}: {e}")
+            return key, None, False, str(e)
+        if cache is not None:
+            cache.put(cache_key, response)
+        return key, response, False, None
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        futures = [executor.submit(draft, key, context) for key, context in targets]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,101 @@
+import heapq
+import itertools
+import time
+
+import utils
+
+GREYLIST_BASE_DELAY = 60  # seconds before the first retry; most greylists clear in 1-5 minutes
+GREYLIST_MAX_DELAY = 15 * 60
+GREYLIST_MAX_ATTEMPTS = 3
+
+
+class RetryScheduler:
+    """
+    Parks addresses that got a temporary 4xx reply (421/450/451/452, see
+    utils.TEMPORARY_SMTP_CODES) and hands them back once their retry time comes,
+    so the rest of the job carries on meanwhile.
+
+    Delays back off per MX host: every retry that is still refused doubles the
+    delay for that host, and a retry that gets through resets it.
+    Every attempt is kept in the history and copied to details["attempts"].
+    """
+
+    def __init__(self, base_delay=GREYLIST_BASE_DELAY, max_delay=GREYLIST_MAX_DELAY,
+                 max_attempts=GREYLIST_MAX_ATTEMPTS):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._queue = []  # heap of (due_at, seq, key)
+        self._seq = itertools.count()
+        self._parked = {}
+        self._history = {}
+        self._mx_strikes = {}
+
+    def submit(self, key, details, context=None):
+        """
+        Record an attempt for key. If it was a temporary failure with attempts left,
+        park it with context for a later retry.
+        Returns: True if parked (hold the result back), False if the result is final.
+        """
+        attempts = self._history.setdefault(key, [])
+        attempts.append({
+            "at": time.time(),
+            "status": details["status"],
+            "smtp_code": details.get("smtp_code"),
+        })
+        details["attempts"] = list(attempts)
+        mx_record = details.get("mx_record") or ""
+
+        if not utils.is_temporary_failure(details):
+            if len(attempts) > 1:
+                self._mx_strikes[mx_record] = 0
+            return False
+
+        if len(attempts) > 1:
+            self._mx_strikes[mx_record] = self._mx_strikes.get(mx_record, 0) + 1
+        if len(attempts) >= self.max_attempts:
+            details["reason"] = f"{details['reason']} Still deferred after {len(attempts)} attempts."
+            return False
+
+        delay = min(self.base_delay * 2 ** self._mx_strikes.get(mx_record, 0), self.max_delay)
+        heapq.heappush(self._queue, (time.monotonic() + delay, next(self._seq), key))
+        self._parked[key] = context
+        return True
+
+    def pending(self):
+        """Returns: List of (key, context) still parked, e.g. for a job checkpoint."""
+        return list(self._parked.items())
+
+    def restore(self, key, context):
+        """Park a key from a checkpoint so it is retried straight away."""
+        heapq.heappush(self._queue, (time.monotonic(), next(self._seq), key))
+        self._parked[key] = context
+
+    def pop_due(self):
+        """Returns: List of (key, context) whose retry time has come."""
+        now = time.monotonic()
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            _, _, key = heapq.heappop(self._queue)
+            due.append((key, self._parked.pop(key)))
+        return due
+
+    def next_due_in(self):
+        """Seconds until the next parked retry is due, or None if nothing is parked."""
+        if not self._queue:
+            return None
+        return max(self._queue[0][0] - time.monotonic(), 0.0)
+
+    def wait(self, timeout=None):
+        """Sleep until the next parked retry is due, or for at most timeout seconds."""
+        delay = self.next_due_in()
+        if delay and timeout is not None:
+            delay = min(delay, timeout)
+        if delay:
+            time.sleep(delay)
+
+    def history(self, key):
+        return list(self._history.get(key, []))
+
+    def __len__(self):
+        return len(self._parked)
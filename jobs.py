@@ -0,0 +1,258 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import greylist
+import pipeline
+import store
+import timing
+import utils
+
+logger = utils.logger
+
+JOB_WORKERS = int(os.getenv("CODEFORGE_JOB_WORKERS", "2"))
+JOB_CHUNK_SIZE = 200  # input rows per checkpoint
+CANCEL_POLL_SECONDS = 2  # how often a job waiting on greylisted retries checks for cancel
+JOB_DIR = os.path.join(pipeline.OUTPUT_DIR, "jobs")
+
+# Job kinds
+PERMUTATOR = "permutator"
+VALIDATOR = "validator"
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobManager:
+    """
+    Runs bulk verification jobs on a background thread pool, outside the Streamlit script thread.
+    Progress is checkpointed to SQLite after every chunk, so queued or interrupted jobs
+    resume from their last checkpoint when a new manager starts.
+    """
+
+    def __init__(self, db_path=store.DB_PATH, workers=JOB_WORKERS, result_store=None):
+        self.db_path = db_path
+        self.result_store = result_store
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    name TEXT,
+                    params TEXT NOT NULL,
+                    input_path TEXT NOT NULL,
+                    output_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    rows_done INTEGER NOT NULL DEFAULT 0,
+                    output_bytes INTEGER NOT NULL DEFAULT 0,
+                    total_rows INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    retry_state TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            try:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN retry_state TEXT")
+            except sqlite3.OperationalError:
+                pass  # column already exists
+            # Jobs cancelled just before the last shutdown have no worker left to finish the cancel
+            self._conn.execute("UPDATE jobs SET status = 'cancelled', updated_at = ? "
+                               "WHERE status = 'cancelling'", (time.time(),))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="codeforge-job")
+        os.makedirs(JOB_DIR, exist_ok=True)
+
+        for job in self.list_jobs(statuses=ACTIVE_STATUSES):
+            logger.info(f"Resuming job {job['id']} at row {job['rows_done']}")
+            self._executor.submit(self._run, job["id"])
+
+    def submit(self, kind, source, params=None, name=None):
+        """
+        Queue a job over a CSV upload (file-like object) and return its id.
+        params: find_mode for permutator jobs, email_col for validator jobs, and for both
+        retry_greylisted (default True) and fmt ("csv" or "parquet", default "csv").
+        """
+        job_id = uuid.uuid4().hex[:12]
+        input_path = os.path.join(JOB_DIR, f"{job_id}_input.csv")
+        output_path = os.path.join(JOB_DIR, f"{job_id}_results.csv")
+
+        source.seek(0)
+        with open(input_path, "wb") as f:
+            shutil.copyfileobj(source, f)
+        source.seek(0)
+        with open(input_path, "rb") as f:
+            total_rows = pipeline.count_csv_rows(f)
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, name, params, input_path, output_path, status, "
+                "total_rows, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, name, json.dumps(params or {}), input_path, output_path,
+                 total_rows, now, now),
+            )
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id):
+        jobs = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list_jobs(self, statuses=None, limit=50):
+        if statuses:
+            return self._query(
+                f"SELECT * FROM jobs WHERE status IN ({', '.join('?' * len(statuses))}) "
+                "ORDER BY created_at DESC LIMIT ?",
+                (*statuses, limit),
+            )
+        return self._query("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+
+    def cancel(self, job_id):
+        """Ask a job to stop after its current chunk."""
+        self._update(job_id, status="cancelling", only_if=ACTIVE_STATUSES)
+
+    def timings(self, job_id):
+        """
+        Per-stage timing stats of a job, as of its last checkpoint.
+        Returns: timing.TimingStats (empty if nothing was probed yet).
+        """
+        path = self._timings_path(job_id)
+        if not os.path.exists(path):
+            return timing.TimingStats()
+        with open(path, encoding="utf-8") as f:
+            return timing.TimingStats.from_dict(json.load(f))
+
+    @staticmethod
+    def _timings_path(job_id):
+        return os.path.join(JOB_DIR, f"{job_id}_timings.json")
+
+    def _query(self, sql, args):
+        with self._lock:
+            cursor = self._conn.execute(sql, args)
+            columns = [c[0] for c in cursor.description]
+            rows = cursor.fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(zip(columns, row))
+            job["params"] = json.loads(job["params"])
+            job["retry_state"] = json.loads(job["retry_state"] or "[]")
+            job["progress"] = min(job["rows_done"] / job["total_rows"], 1.0) if job["total_rows"] else 0.0
+            jobs.append(job)
+        return jobs
+
+    def _update(self, job_id, only_if=None, **fields):
+        fields["updated_at"] = time.time()
+        sql = f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?"
+        args = [*fields.values(), job_id]
+        if only_if:
+            sql += f" AND status IN ({', '.join('?' * len(only_if))})"
+            args.extend(only_if)
+        with self._lock, self._conn:
+            self._conn.execute(sql, args)
+
+    def _run(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return
+        if job["status"] == "cancelling":
+            self._update(job_id, status="cancelled")
+            return
+        if job["status"] not in ACTIVE_STATUSES:
+            return
+        self._update(job_id, status="running")
+        try:
+            self._process(job)
+        except JobCancelled:
+            self._update(job_id, status="cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e))
+        else:
+            self._update(job_id, status="done")
+
+    def _process(self, job):
+        params = job["params"]
+        rows_done = job["rows_done"]
+        pattern_model = utils.DomainPatternModel(store=self.result_store)
+        find_mode = params.get("find_mode", True)
+        stats = self.timings(job["id"])
+
+        # DNS pre-pass over the whole input before any SMTP work
+        domain_col = "company_domain" if job["kind"] == PERMUTATOR else params["email_col"]
+        dns_info = pipeline.preresolve_csv(job["input_path"], domain_col)
+
+        # Greylisted rows parked at the last checkpoint are retried first
+        retry = greylist.RetryScheduler() if params.get("retry_greylisted", True) else None
+        for index, context in job["retry_state"]:
+            retry.restore(index, context)
+
+        def verify_chunk(chunk):
+            chunk.columns = pipeline.normalize_columns(chunk.columns)
+            chunk.index = range(rows_done, rows_done + len(chunk))
+            if job["kind"] == PERMUTATOR:
+                return pipeline.verify_people_chunk(
+                    chunk, find_mode, pattern_model, self.result_store,
+                    dns_info=dns_info, retry=retry, stats=stats
+                )
+            return pipeline.verify_email_chunk(
+                chunk, params["email_col"], self.result_store, dns_info=dns_info, retry=retry,
+                stats=stats
+            )
+
+        def retry_rows():
+            if job["kind"] == PERMUTATOR:
+                return pipeline.retry_people_rows(retry, find_mode, pattern_model, self.result_store,
+                                                  dns_info, stats=stats)
+            return pipeline.retry_email_rows(retry, self.result_store, dns_info, stats=stats)
+
+        def checkpoint(chunk):
+            nonlocal rows_done
+            if chunk is not None:
+                rows_done += len(chunk)
+            self._checkpoint(job["id"], rows_done, writer, retry, stats)
+
+        # Skip rows that were checkpointed before a restart; the header row is kept
+        reader = pd.read_csv(job["input_path"], chunksize=JOB_CHUNK_SIZE,
+                             skiprows=range(1, rows_done + 1))
+        with pipeline.ResultWriter(path=job["output_path"], resume_at=job["output_bytes"]) as writer:
+            # Backoffs run to minutes, so the final drain waits in slices to notice a cancel
+            finished = pipeline.process_chunks(
+                reader, verify_chunk, writer, retry, retry_rows, after_write=checkpoint,
+                cancelled=lambda: self.get(job["id"])["status"] == "cancelling",
+                poll_seconds=CANCEL_POLL_SECONDS
+            )
+            if not finished:
+                raise JobCancelled()
+
+        # Output is checkpointed as CSV and converted once complete
+        if params.get("fmt", "csv") == "parquet" and os.path.exists(job["output_path"]):
+            output_path = os.path.splitext(job["output_path"])[0] + ".parquet"
+            pipeline.csv_to_parquet(job["output_path"], output_path)
+            self._update(job["id"], output_path=output_path)
+            os.remove(job["output_path"])
+
+    def _checkpoint(self, job_id, rows_done, writer, retry, stats):
+        # Rows consumed, the output size they correspond to, and what is still parked.
+        # Timings are saved first; a restart replays at most one chunk into them.
+        path = self._timings_path(job_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(stats.to_json())
+        os.replace(path + ".tmp", path)
+        self._update(job_id, rows_done=rows_done, output_bytes=writer.tell(),
+                     retry_state=json.dumps(retry.pending() if retry is not None else [], default=str))
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
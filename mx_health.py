@@ -0,0 +1,106 @@
+import threading
+import time
+
+FAILURE_THRESHOLD = 3  # consecutive connect failures/timeouts before a host's circuit opens
+COOLDOWN = 60  # seconds a host is skipped once its circuit is open
+LATENCY_ALPHA = 0.3  # weight of the newest sample in the latency moving average
+
+
+class MXUnavailable(Exception):
+    """Every MX host for a domain is cooling down after repeated failures."""
+
+    def __init__(self, hosts):
+        super().__init__(f"Every MX host is cooling down after repeated failures: {', '.join(hosts)}")
+        self.hosts = list(hosts)
+
+
+class MXHealthTracker:
+    """
+    Per-MX-host health with a circuit breaker.
+    After FAILURE_THRESHOLD consecutive failures a host is skipped for COOLDOWN seconds.
+    After that one trial connection is let through per cooldown (half-open): success
+    closes the circuit, another failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {
+                "successes": 0,
+                "timeouts": 0,
+                "connect_failures": 0,
+                "consecutive_failures": 0,
+                "latency": None,
+                "open_until": 0.0,
+            }
+        return state
+
+    def allow(self, host):
+        """True if a connection to host should be attempted now."""
+        with self._lock:
+            state = self._state(host.lower())
+            if state["consecutive_failures"] < self.failure_threshold:
+                return True
+            now = time.monotonic()
+            if now < state["open_until"]:
+                return False
+            # Half-open: let this trial through and hold everyone else back another cooldown
+            state["open_until"] = now + self.cooldown
+            return True
+
+    def record_success(self, host, latency=None):
+        with self._lock:
+            state = self._state(host.lower())
+            state["successes"] += 1
+            state["consecutive_failures"] = 0
+            if latency is not None:
+                previous = state["latency"]
+                state["latency"] = latency if previous is None else (
+                    LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * previous
+                )
+
+    def record_failure(self, host, kind="connect"):
+        """kind: 'timeout' or 'connect' (refused, reset, unreachable, non-220 banner)."""
+        with self._lock:
+            state = self._state(host.lower())
+            state["timeouts" if kind == "timeout" else "connect_failures"] += 1
+            state["consecutive_failures"] += 1
+            if state["consecutive_failures"] >= self.failure_threshold:
+                state["open_until"] = time.monotonic() + self.cooldown
+
+    def latency(self, host):
+        with self._lock:
+            state = self._hosts.get(host.lower())
+            return state["latency"] if state else None
+
+    def snapshot(self):
+        """Returns: List of per-host health dicts, for diagnostics."""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "host": host,
+                "circuit": self._circuit(state, now),
+                "successes": state["successes"],
+                "timeouts": state["timeouts"],
+                "connect_failures": state["connect_failures"],
+                "avg_connect_latency": state["latency"],
+            } for host, state in sorted(self._hosts.items())]
+
+    def _circuit(self, state, now):
+        if state["consecutive_failures"] < self.failure_threshold:
+            return "closed"
+        return "open" if now < state["open_until"] else "half-open"
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+
+# Shared by the blocking and asyncio verifiers
+tracker = MXHealthTracker()
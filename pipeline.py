@@ -0,0 +1,523 @@
+import csv
+import io
+import os
+import tempfile
+import uuid
+from collections import deque
+
+import pandas as pd
+
+import async_verifier
+import prefilter
+import utils
+from store import status_class
+
+CHUNK_SIZE = 1000  # rows read from the upload at a time
+PREVIEW_ROWS = 500  # most recent result rows kept in memory for display
+OUTPUT_DIR = os.getenv("CODEFORGE_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "codeforge"))
+
+# Row colours of the results viewer, by status class
+STATUS_CLASSES = ["Valid", "Risky", "Invalid", "Unknown"]
+STATUS_COLORS = {"Valid": "#90ee90", "Risky": "#ffd700", "Invalid": "#ffcccb"}
+# Derived columns prepare_results adds for filtering and styling; not shown or downloaded
+RESULT_HELPER_COLUMNS = ["_class", "_domain"]
+RESULT_SCAN_ROWS = 50000  # rows of a results file held in memory at a time by the viewer
+
+
+def _pyarrow():
+    """Parquet output is optional, and pyarrow is only imported once it is asked for."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow; install it or use fmt='csv'.")
+    return pa, pq
+
+
+def normalize_columns(columns):
+    return [str(c).strip().lower().replace(' ', '_') for c in columns]
+
+
+def read_csv_columns(source):
+    """Read only the header of a CSV upload and rewind it. Returns normalized column names."""
+    columns = normalize_columns(pd.read_csv(source, nrows=0).columns)
+    source.seek(0)
+    return columns
+
+
+def count_csv_rows(source):
+    """
+    Cheap row estimate for progress bars: counts newlines without parsing.
+    Quoted fields with embedded newlines make this an overestimate.
+    """
+    source.seek(0)
+    lines = 0
+    last = b""
+    while True:
+        block = source.read(1 << 20)
+        if not block:
+            break
+        lines += block.count(b"\n")
+        last = block[-1:]
+    source.seek(0)
+    if last and last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)  # minus the header
+
+
+def iter_csv_chunks(source, chunksize=CHUNK_SIZE):
+    """Yield DataFrame chunks of a CSV with normalized column names, keeping memory flat."""
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        chunk.columns = normalize_columns(chunk.columns)
+        yield chunk
+
+
+def domains_to_resolve(values):
+    """
+    Unique, lower-cased domains in a column of domains (company_domain) or addresses.
+    Addresses the pre-filter settles locally never need their domain resolved.
+    Returns: set of domains
+    """
+    values = pd.Series(values).dropna().astype(str).str.strip().str.lower()
+    if values.str.contains('@', regex=False).any():
+        checks = prefilter.check(values)
+        values = checks.loc[checks["status"].isna(), "canonical"]
+    domains = set(values.str.split('@').str[-1])
+    domains.discard('')
+    return domains
+
+
+def collect_domains(source, column, chunksize=CHUNK_SIZE):
+    """
+    Unique, lower-cased domains in one column of a CSV, read in chunks.
+    Works for a domain column (company_domain) or an email column.
+    """
+    domains = set()
+    for chunk in iter_csv_chunks(source, chunksize):
+        domains.update(domains_to_resolve(chunk[column]))
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return domains
+
+
+def preresolve_csv(source, column, max_workers=32):
+    """
+    DNS pre-pass for a bulk job: resolve MX/SPF/DMARC for every unique domain in
+    the column concurrently before any SMTP work.
+    Returns: dns_info dict, as utils.preresolve_domains.
+    """
+    return utils.preresolve_domains(collect_domains(source, column), max_workers)
+
+
+def verify_people_chunk(chunk, find_mode=True, pattern_model=None, store=None, on_row=None,
+                        dns_info=None, retry=None, stats=None):
+    """
+    Permutate and verify every person in a chunk with first_name/last_name/company_domain columns.
+    With dns_info, people on domains without MX are answered without any probing, and the
+    rest are processed grouped by MX host. Output keeps the input row order.
+    With retry (greylist.RetryScheduler), people who only got temporary 4xx replies are
+    parked and left out; collect them later with retry_people_rows.
+    With stats (timing.TimingStats), per-stage timings of every probe are recorded.
+    Returns: List of result row dicts.
+    """
+    dns_info = dns_info or {}
+    rows = list(chunk.iterrows())
+    if dns_info:
+        def mx_of(item):
+            info = dns_info.get(str(item[1]['company_domain']).lower().strip())
+            return (info[0] or "") if info else ""
+        order = sorted(range(len(rows)), key=lambda i: mx_of(rows[i]))
+    else:
+        order = range(len(rows))
+
+    per_row = {}
+    for i in order:
+        index, row = rows[i]
+        if on_row is not None:
+            on_row(row)
+        checked = _check_person(row, find_mode, pattern_model, store, dns_info)
+        _record_timings(stats, checked)
+        per_row[i] = _person_rows(index, row.to_dict(), checked, retry)
+
+    return [result for i in range(len(rows)) for result in per_row[i]]
+
+
+def retry_people_rows(retry, find_mode=True, pattern_model=None, store=None, dns_info=None,
+                      wait=False, stats=None):
+    """
+    Re-check the parked people whose retry time has come.
+    With wait, keep sleeping until nothing is parked (end of a job).
+    Returns: List of result row dicts for people whose result is now final.
+    """
+    results = []
+    while True:
+        for index, row in retry.pop_due():
+            checked = _check_person(row, find_mode, pattern_model, store, dns_info or {})
+            _record_timings(stats, checked)
+            results.extend(_person_rows(index, row, checked, retry))
+        if not wait or not len(retry):
+            return results
+        retry.wait()
+
+
+def _check_person(row, find_mode, pattern_model, store, dns_info):
+    if not all(_text(row[column]) for column in ('first_name', 'last_name', 'company_domain')):
+        # Blank (NaN) or non-text cells: report the row instead of failing the chunk
+        return [("", {
+            "status": "Invalid (Syntax)",
+            "reason": "First name, last name and company domain are required.",
+        })]
+    domain = row['company_domain'].lower().strip()
+    if domain in dns_info and not dns_info[domain][0]:
+        # Dead domain: report once per person instead of probing every permutation
+        candidates = utils.generate_permutations(row['first_name'], row['last_name'], domain)
+        return [(candidates[0] if candidates else "", {
+            "status": "Unknown (No MX)",
+            "reason": "No MX records found for domain.",
+        })]
+    # One SMTP session covers every permutation on the domain
+    if find_mode and pattern_model is not None:
+        return pattern_model.find_email(
+            row['first_name'], row['last_name'], row['company_domain'], dns_info=dns_info
+        )
+    return utils.find_email(
+        row['first_name'], row['last_name'], row['company_domain'],
+        stop_on_valid=find_mode, store=store, dns_info=dns_info
+    )
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _record_timings(stats, checked):
+    if stats is not None:
+        for email, details in checked:
+            stats.add(email, details)
+
+
+def _person_rows(index, row, checked, retry):
+    attempts = 1
+    if retry is not None and checked:
+        deferred = []
+        if not any(d["status"].startswith("Valid") for _, d in checked):
+            deferred = [d for _, d in checked if utils.is_temporary_failure(d)]
+        # Only deferred people (and their retries) get an attempt history
+        if deferred or retry.history(index):
+            if retry.submit(index, deferred[0] if deferred else checked[0][1], row):
+                return []
+            attempts = len(retry.history(index))
+    return [{
+        "First Name": _text(row['first_name']),
+        "Last Name": _text(row['last_name']),
+        "Email": email,
+        "Status": verification_result["status"],
+        "Confidence": verification_result.get("confidence"),
+        "Attempts": attempts
+    } for email, verification_result in checked]
+
+
+def verify_email_chunk(chunk, email_col, store=None, on_result=None, dns_info=None, retry=None,
+                       concurrency=100, per_mx_limit=3, stats=None):
+    """
+    Verify the addresses in one column of a chunk concurrently, capped per MX host.
+    Addresses go through verify_addresses, so malformed, duplicate and disposable
+    entries cost no network work.
+    With retry (greylist.RetryScheduler), rows that got a temporary 4xx reply are
+    parked and left out; collect them later with retry_email_rows.
+    With stats (timing.TimingStats), per-stage timings of every probe are recorded.
+    Returns: List of result row dicts, one per input row that has a final result.
+    """
+    checks = prefilter.check(chunk[email_col])
+    verified = verify_addresses(checks, store, on_result, dns_info, concurrency, per_mx_limit, stats)
+    return _email_rows(list(zip(chunk.index, checks["email"])), verified, retry)
+
+
+def retry_email_rows(retry, store=None, dns_info=None, wait=False, concurrency=100, per_mx_limit=3,
+                     stats=None):
+    """
+    Re-verify the parked addresses whose retry time has come, concurrently.
+    With wait, keep sleeping until nothing is parked (end of a job).
+    Returns: List of result row dicts for rows whose result is now final.
+    """
+    results = []
+    while True:
+        due = retry.pop_due()
+        if due:
+            verified = verify_addresses([email for _, email in due], store, dns_info=dns_info,
+                                        concurrency=concurrency, per_mx_limit=per_mx_limit, stats=stats)
+            results.extend(_email_rows(due, verified, retry))
+        if not wait or not len(retry):
+            return results
+        retry.wait()
+
+
+def process_chunks(chunks, verify_chunk, writer, retry=None, retry_rows=None, after_write=None,
+                   on_drain=None, cancelled=None, poll_seconds=None):
+    """
+    Run a bulk list through verify_chunk and writer (ResultWriter) chunk by chunk,
+    writing parked greylisted rows that have come due along with each chunk, then
+    draining the rest of retry once the input is exhausted.
+    verify_chunk(chunk) and retry_rows() return result row dicts; retry_rows collects
+    due rows without waiting (retry_email_rows / retry_people_rows bound to their arguments).
+    after_write(chunk) runs after every write; chunk is None for writes while draining.
+    on_drain(pending) runs once before draining, with the number of rows still parked.
+    cancelled() is checked before every chunk and while draining; the drain then sleeps
+    at most poll_seconds at a time so a cancel is noticed during long backoffs.
+    Returns: False if cancelled() stopped the run, else True.
+    """
+    for chunk in chunks:
+        if cancelled is not None and cancelled():
+            return False
+        results = verify_chunk(chunk)
+        if retry is not None:
+            results += retry_rows()
+        writer.write(results)
+        if after_write is not None:
+            after_write(chunk)
+
+    if retry is not None and len(retry) and on_drain is not None:
+        on_drain(len(retry))
+    while retry is not None and len(retry):
+        if cancelled is not None and cancelled():
+            return False
+        retry.wait(timeout=poll_seconds)
+        if retry.next_due_in():
+            continue
+        writer.write(retry_rows())
+        if after_write is not None:
+            after_write(None)
+    return True
+
+
+def verify_addresses(emails, store=None, on_result=None, dns_info=None, concurrency=100, per_mx_limit=3,
+                     stats=None):
+    """
+    Pre-filter addresses locally, verify each surviving canonical address (lower-cased,
+    +tag removed) once over the network, and fan the results back out to every input.
+    emails: list or Series of addresses, or a prefilter.check() frame of them.
+    Returns: Dict mapping each stripped input address to its details.
+    """
+    checks = emails if isinstance(emails, pd.DataFrame) else prefilter.check(emails)
+    decided = checks["status"].notna()
+    verified = async_verifier.verify_emails_concurrent(
+        checks.loc[~decided, "canonical"].unique().tolist(), concurrency=concurrency,
+        per_mx_limit=per_mx_limit, on_result=on_result, store=store, dns_info=dns_info
+    )
+    _record_timings(stats, verified.items())
+
+    results = {}
+    for row in checks.itertuples(index=False):
+        if row.status is None:
+            results[row.email] = verified[row.canonical]
+        elif row.email not in results:
+            results[row.email] = prefilter.local_details(row)
+            if on_result is not None:
+                on_result(row.email, results[row.email])
+    return results
+
+
+def _email_rows(indexed_emails, verified, retry):
+    results = []
+    for index, email in indexed_emails:
+        # Copy so rows sharing an address keep their own attempt history
+        details = dict(verified[email])
+        if retry is not None and (utils.is_temporary_failure(details) or retry.history(index)):
+            if retry.submit(index, details, email):
+                continue
+        results.append({
+            "Original Row ID": index,
+            "Email": email,
+            "Status": details['status'],
+            "Reason": details['reason'],
+            "Provider": "Free" if details['is_free_provider'] else "Business",
+            "Attempts": len(details.get("attempts", [])) or 1
+        })
+    return results
+
+
+class ResultWriter:
+    """
+    Append result rows to an on-disk CSV or Parquet file as they are produced,
+    keeping only the most recent rows in memory for display.
+    """
+
+    def __init__(self, name="results", fmt="csv", path=None, preview_rows=PREVIEW_ROWS, resume_at=None):
+        """
+        resume_at: byte offset of a CSV checkpoint (see tell()). The existing file is
+        truncated there and appended to, so rows written after the checkpoint are not duplicated.
+        """
+        if fmt == "parquet":
+            _pyarrow()
+        if resume_at is not None and fmt != "csv":
+            raise ValueError("Only CSV output can be resumed.")
+        self.fmt = fmt
+        self.resume_at = resume_at
+        if path is None:
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            path = os.path.join(OUTPUT_DIR, f"{name}_{uuid.uuid4().hex[:8]}.{fmt}")
+        self.path = path
+        self.rows_written = 0
+        self._preview = deque(maxlen=preview_rows)
+        self._file = None
+        self._csv = None
+        self._parquet = None
+        self._schema = None
+
+    def write(self, rows):
+        """Append a list of row dicts. The first batch fixes the column order."""
+        if not rows:
+            return
+        if self.fmt == "parquet":
+            self._write_parquet(rows)
+        else:
+            if self._csv is None:
+                self._open_csv(list(rows[0]))
+            self._csv.writerows(rows)
+            self._file.flush()
+        self.rows_written += len(rows)
+        self._preview.extend(rows)
+
+    def _open_csv(self, fieldnames):
+        resuming = self.resume_at is not None and self.resume_at > 0 and os.path.exists(self.path)
+        if resuming:
+            with open(self.path, "r+b") as f:
+                f.truncate(self.resume_at)
+            self._file = open(self.path, "a", newline="", encoding="utf-8")
+        else:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+        self._csv = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+        if not resuming:
+            self._csv.writeheader()
+
+    def tell(self):
+        """Byte size of the CSV output written so far, usable as a resume_at checkpoint."""
+        if self._file is None:
+            return self.resume_at or 0
+        self._file.flush()
+        return self._file.tell()
+
+    def _write_parquet(self, rows):
+        pa, pq = _pyarrow()
+        if self._parquet is None:
+            # Columns that are all-null in the first batch are typed as strings
+            inferred = pa.Table.from_pylist(rows).schema
+            self._schema = pa.schema([
+                pa.field(f.name, pa.string() if pa.types.is_null(f.type) else f.type)
+                for f in inferred
+            ])
+            self._parquet = pq.ParquetWriter(self.path, self._schema)
+        string_cols = [f.name for f in self._schema if pa.types.is_string(f.type)]
+        rows = [
+            {**row, **{c: str(row[c]) for c in string_cols if row.get(c) is not None}}
+            for row in rows
+        ]
+        self._parquet.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+
+    def preview_df(self):
+        return pd.DataFrame(list(self._preview))
+
+    @property
+    def mime(self):
+        return "application/octet-stream" if self.fmt == "parquet" else "text/csv"
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def csv_to_parquet(src, dest, chunksize=CHUNK_SIZE):
+    """
+    Rewrite a CSV results file as Parquet, a chunk at a time. Background jobs write CSV,
+    which can be resumed from a byte checkpoint, and convert once they finish.
+    """
+    with ResultWriter(fmt="parquet", path=dest) as writer:
+        for chunk in pd.read_csv(src, chunksize=chunksize):
+            writer.write(chunk.astype(object).where(chunk.notna(), None).to_dict("records"))
+
+
+def iter_results(path, fmt="csv", chunksize=RESULT_SCAN_ROWS):
+    """Read a results file in chunks, CSV rows or Parquet batches, each passed through prepare_results."""
+    if fmt == "parquet":
+        _, pq = _pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield prepare_results(batch.to_pandas())
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype={"Status": "category"}):
+            yield prepare_results(chunk)
+
+
+def results_page(path, fmt="csv", classes=None, domain=None, start=0, count=100):
+    """
+    One page of a results file on disk, filtered chunk by chunk so memory stays flat
+    however large the file is.
+    Returns: (page DataFrame, rows matching the filters, rows in the file)
+    """
+    pieces = []
+    matched = total = 0
+    for chunk in iter_results(path, fmt):
+        total += len(chunk)
+        chunk = filter_results(chunk, classes, domain)
+        first, last = max(start - matched, 0), start + count - matched
+        if last > 0 and first < len(chunk):
+            pieces.append(chunk.iloc[first:last])
+        matched += len(chunk)
+    page = pd.concat(pieces, ignore_index=True) if pieces else pd.DataFrame()
+    return page, matched, total
+
+
+def filtered_results_csv(path, fmt="csv", classes=None, domain=None):
+    """CSV bytes of the rows of a results file that match the filters, read chunk by chunk."""
+    buffer = io.StringIO()
+    for i, chunk in enumerate(iter_results(path, fmt)):
+        filter_results(chunk, classes, domain).drop(columns=RESULT_HELPER_COLUMNS).to_csv(
+            buffer, index=False, header=i == 0
+        )
+    return buffer.getvalue().encode("utf-8")
+
+
+def prepare_results(df):
+    """
+    Make Status categorical and add the _class (status class) and _domain helper columns,
+    so filtering and colouring work per category instead of calling Python per row.
+    Modifies and returns df.
+    """
+    status = df["Status"].astype("category")
+    df["Status"] = status
+    df["_class"] = status.map({s: status_class(str(s)) for s in status.cat.categories}).astype("category")
+    df["_domain"] = df["Email"].astype(str).str.rsplit("@", n=1).str[-1].str.lower().astype("category")
+    return df
+
+
+def filter_results(df, classes=None, domain=None):
+    """Rows of a prepare_results frame in the given status classes and/or on one domain."""
+    mask = pd.Series(True, index=df.index)
+    if classes:
+        mask &= df["_class"].isin(classes)
+    if domain:
+        mask &= df["_domain"] == domain.strip().lower()
+    return df[mask]
+
+
+def style_results(page):
+    """
+    Colour the Status cells of one page of results by status class, with a single
+    vectorized lookup. Returns: Styler without the helper columns.
+    """
+    css = ("background-color: " + page["_class"].map(STATUS_COLORS).astype(object)).fillna("")
+    return page.drop(columns=RESULT_HELPER_COLUMNS).style.apply(lambda _: css, subset=["Status"])
+
+
+def results_csv(df):
+    """CSV bytes of a results frame without the helper columns."""
+    return df.drop(columns=RESULT_HELPER_COLUMNS).to_csv(index=False).encode("utf-8")
@@ -0,0 +1,109 @@
+"""
+Local checks that run over a whole column of addresses before any DNS or SMTP work:
+syntax, case/+tag normalization for dedupe, and disposable, role and free provider flags.
+"""
+import os
+import threading
+
+import pandas as pd
+
+import utils
+
+logger = utils.logger
+
+DISPOSABLE_DOMAINS_PATH = os.getenv(
+    "CODEFORGE_DISPOSABLE_DOMAINS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "disposable_domains.txt"),
+)
+MAX_LOCAL_LENGTH = 64  # RFC 5321 4.5.3.1.1
+MAX_ADDRESS_LENGTH = 254  # RFC 5321 path limit minus the angle brackets
+
+# RFC 5322 addr-spec: dot-atom or quoted-string local part, and a hostname domain
+# (address literals like user@[192.0.2.1] have no MX and are rejected)
+_ATEXT = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]"
+_LOCAL = rf'(?:{_ATEXT}+(?:\.{_ATEXT}+)*|"(?:[\x20\x21\x23-\x5b\x5d-\x7e]|\\[\x20-\x7e])*")'
+_LABEL = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+_DOMAIN = rf"(?:{_LABEL}\.)+(?:[A-Za-z]{{2,63}}|xn--[A-Za-z0-9-]{{1,59}})"
+EMAIL_PATTERN = rf"{_LOCAL}@{_DOMAIN}"
+
+_disposable = None
+_disposable_lock = threading.Lock()
+
+
+def disposable_domains():
+    """The disposable provider list, read once. Returns: frozenset of lower-cased domains."""
+    global _disposable
+    with _disposable_lock:
+        if _disposable is None:
+            try:
+                with open(DISPOSABLE_DOMAINS_PATH, encoding="utf-8") as f:
+                    _disposable = frozenset(
+                        line.strip().lower() for line in f if line.strip() and not line.startswith("#")
+                    )
+            except OSError as e:
+                logger.error(f"Could not read disposable domain list: {e}")
+                _disposable = frozenset()
+        return _disposable
+
+
+def check(emails):
+    """
+    Run the local checks over a column of addresses, vectorized.
+    Returns: DataFrame indexed like emails, with columns
+        email       the input, stripped
+        canonical   lower-cased with any +tag removed; rows sharing it need one network check
+        status      final status of rows decided here ("Invalid (Syntax)", "Risky (Disposable)"), else None
+        reason, is_role_account, is_free_provider, is_disposable
+    """
+    # Whole-column regex replaces stay in compiled code; splitting into lists does not
+    email = pd.Series(emails).astype("string").fillna("").str.strip()
+    raw_local = email.str.replace(r"@[^@]*$", "", regex=True)
+    domain = email.str.replace(r"^.*@", "", regex=True).str.lower()
+
+    valid = (
+        email.str.fullmatch(EMAIL_PATTERN).fillna(False)
+        & (raw_local.str.len() <= MAX_LOCAL_LENGTH)
+        & (email.str.len() <= MAX_ADDRESS_LENGTH)
+    )
+    # Subaddress tags of unquoted local parts are dropped: "jane+news" -> "jane"
+    local = raw_local.str.lower()
+    untagged = local.str.replace(r"\+.*$", "", regex=True)
+    local = untagged.where(~local.str.startswith('"') & (untagged != ""), local)
+
+    disposable = disposable_domains()
+    # Every parent suffix is checked too, to catch per-user subdomains of a provider
+    # (a@x.y.mailinator.com); each pass strips one more label off the rows that have one
+    listed = domain.isin(disposable)
+    suffix = domain[valid]
+    while len(suffix):
+        suffix = suffix[suffix.str.contains(".", regex=False)].str.replace(r"^[^.]*\.", "", regex=True)
+        listed |= suffix.isin(disposable).reindex(domain.index, fill_value=False)
+    is_disposable = valid & listed
+
+    checks = pd.DataFrame({
+        "email": email.astype(object),
+        "canonical": (local + "@" + domain).where(valid, email).astype(object),
+        "status": None,
+        "reason": None,
+        "is_role_account": (valid & local.isin(utils.ROLE_ACCOUNTS)).astype(bool),
+        "is_free_provider": (valid & domain.isin(utils.FREE_PROVIDERS)).astype(bool),
+        "is_disposable": is_disposable.astype(bool),
+    }, index=email.index)
+    checks.loc[~valid, ["status", "reason"]] = ["Invalid (Syntax)", "Not a valid email address."]
+    checks.loc[is_disposable, ["status", "reason"]] = ["Risky (Disposable)", "Disposable email provider."]
+    return checks
+
+
+def local_details(row):
+    """Details dict, shaped like utils._base_details, for a row of check() with a status."""
+    return {
+        "status": row.status,
+        "mx_record": None,
+        "smtp_banner": None,
+        "has_spf": None,
+        "has_dmarc": None,
+        "is_role_account": row.is_role_account,
+        "is_free_provider": row.is_free_provider,
+        "is_disposable": row.is_disposable,
+        "reason": row.reason,
+    }
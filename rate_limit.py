@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+# MX host suffixes that belong to one provider; all of a provider's hosts share a bucket
+PROVIDER_SUFFIXES = {
+    "google.com": "google",
+    "googlemail.com": "google",
+    "outlook.com": "microsoft",
+    "hotmail.com": "microsoft",
+    "yahoodns.net": "yahoo",
+    "icloud.com": "apple",
+    "pphosted.com": "proofpoint",
+    "mimecast.com": "mimecast",
+    "zoho.com": "zoho",
+}
+
+# Sustained SMTP operations per second and burst size, per provider.
+# An operation is one connection or one RCPT TO.
+PROVIDER_LIMITS = {
+    "google": (5.0, 10),
+    "microsoft": (5.0, 10),
+    "yahoo": (2.0, 5),
+    "apple": (2.0, 5),
+}
+DEFAULT_LIMIT = (
+    float(os.getenv("CODEFORGE_SMTP_RATE", "20")),
+    int(os.getenv("CODEFORGE_SMTP_BURST", "40")),
+)
+
+BACKOFF_FACTOR = 0.5  # rate multiplier on a 421 reply
+SLOWDOWN_FACTOR = 0.8  # rate multiplier when connect latency climbs
+RECOVERY_STEP = 0.05  # fraction of the configured rate won back per accepted operation
+MIN_RATE_FRACTION = 0.05  # never back off below this fraction of the configured rate
+LATENCY_RISE = 3.0  # connect latency this many times the best seen counts as a slowdown
+LATENCY_FLOOR = 0.5  # seconds; faster connects never count as a slowdown
+
+
+def provider_for(host):
+    """Returns: The provider name for a known MX host suffix, else the host itself."""
+    host = host.lower().rstrip('.')
+    for suffix, provider in PROVIDER_SUFFIXES.items():
+        if host == suffix or host.endswith("." + suffix):
+            return provider
+    return host
+
+
+class TokenBucket:
+    """
+    Token bucket whose rate backs off multiplicatively on throttling and recovers
+    additively (AIMD) towards the configured rate.
+    """
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.best_latency = None
+
+    def reserve(self):
+        """Take one token. Returns: Seconds to wait before using it (0 if available now)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(-self.tokens / self.rate, 0.0)
+
+    def slow_down(self, factor):
+        self.rate = max(self.rate * factor, self.max_rate * MIN_RATE_FRACTION)
+        # Give up the saved-up burst so the lower rate applies straight away
+        self.tokens = min(self.tokens, 0.0)
+
+    def recover(self):
+        self.rate = min(self.rate + self.max_rate * RECOVERY_STEP, self.max_rate)
+
+
+class ProviderRateLimiter:
+    """
+    Rate limits SMTP connections and RCPTs per MX provider (see provider_for), so
+    concurrent verification does not get us tarpitted or blocked by the big providers.
+    Rates adapt: a 421 reply halves the provider's rate, a rising connect latency
+    trims it, and accepted operations win it back gradually.
+    """
+
+    def __init__(self, limits=None, default=DEFAULT_LIMIT):
+        self.limits = dict(PROVIDER_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.default = default
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        provider = provider_for(host)
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            bucket = self._buckets[provider] = TokenBucket(*self.limits.get(provider, self.default))
+        return bucket
+
+    def reserve(self, host):
+        """Take a token for host. Returns: Seconds to wait first (for asyncio callers)."""
+        with self._lock:
+            return self._bucket(host).reserve()
+
+    def acquire(self, host):
+        """Block until an operation on host is allowed."""
+        delay = self.reserve(host)
+        if delay:
+            time.sleep(delay)
+
+    def record_reply(self, host, code):
+        """Feed back an SMTP reply code: 421 backs off, anything else helps recovery."""
+        with self._lock:
+            bucket = self._bucket(host)
+            if code == 421:
+                bucket.slow_down(BACKOFF_FACTOR)
+            else:
+                bucket.recover()
+
+    def record_latency(self, host, latency):
+        """Feed back a connect latency; slow down when it climbs well above the best seen."""
+        with self._lock:
+            bucket = self._bucket(host)
+            if bucket.best_latency is None or latency < bucket.best_latency:
+                bucket.best_latency = latency
+            elif latency > max(bucket.best_latency * LATENCY_RISE, LATENCY_FLOOR):
+                bucket.slow_down(SLOWDOWN_FACTOR)
+
+    def snapshot(self):
+        """Returns: List of per-provider rate dicts, for diagnostics."""
+        with self._lock:
+            return [{
+                "provider": provider,
+                "rate": round(bucket.rate, 3),
+                "configured_rate": bucket.max_rate,
+                "burst": bucket.burst,
+            } for provider, bucket in sorted(self._buckets.items())]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Shared by the blocking and asyncio verifiers
+limiter = ProviderRateLimiter()
@@ -0,0 +1,141 @@
+import math
+import re
+from collections import Counter
+
+TOKEN_BUDGET = 1000  # resume tokens sent to the LLM
+CHARS_PER_TOKEN = 4  # rough estimate for English text
+HEADER_CHARS = 300  # the opening lines (name, contact) are always kept up to this size
+SECTION_LINES = 8  # section size when no headings are found, and window size for long sections
+MAX_SECTION_CHARS = 800  # longer sections are ranked in SECTION_LINES windows instead of whole
+
+# Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_YEAR = re.compile(r"\b(?:19|20)\d{2}\b")
+_SECTION_WORDS = {
+    "summary", "profile", "objective", "about", "experience", "employment", "history", "work",
+    "education", "skills", "projects", "certifications", "certificates", "courses", "coursework",
+    "awards", "honors", "honours", "achievements", "publications", "languages", "interests",
+    "activities", "volunteering", "leadership", "qualifications", "training", "references", "contact",
+}
+_SECTION_MODIFIERS = {
+    "professional", "technical", "relevant", "key", "core", "personal", "selected", "academic",
+    "additional", "other", "and", "of",
+}
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is",
+    "it", "its", "of", "on", "or", "our", "that", "the", "their", "to", "we", "will", "with",
+    "you", "your", "i", "my", "me", "this", "who", "what", "about", "us",
+}
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def tokenize(text):
+    return [w.rstrip('.') for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _is_heading(line):
+    # "EXPERIENCE", "Projects:", "Technical Skills" - short lines that introduce a section.
+    # Title-cased lines only count when made of section words, so job titles
+    # ("Senior Software Engineer") and date ranges ("2020 - Present") do not split sections.
+    words = line.split()
+    if not words or len(words) > 4 or len(line) > 40 or _YEAR.search(line):
+        return False
+    if line.isupper() or line.endswith(':'):
+        return True
+    names = [w.lower() for w in _WORD.findall(line.lower())]
+    return (any(w in _SECTION_WORDS for w in names)
+            and all(w in _SECTION_WORDS or w in _SECTION_MODIFIERS for w in names))
+
+
+def split_sections(resume_text):
+    """
+    Split resume text into sections at heading-like lines. Text without recognisable
+    headings is split every SECTION_LINES lines instead, and so is any section longer
+    than MAX_SECTION_CHARS (a whole work history), so it can be kept in part.
+    Returns: List of section strings in document order.
+    """
+    lines = [line.strip() for line in resume_text.splitlines() if line.strip()]
+    sections = []
+    current = []
+    for line in lines:
+        if current and _is_heading(line):
+            sections.append(current)
+            current = []
+        current.append(line)
+    if current:
+        sections.append(current)
+
+    if len(sections) <= 1:
+        sections = [lines]
+    windows = []
+    for section in sections:
+        if len(sections) > 1 and sum(len(line) + 1 for line in section) <= MAX_SECTION_CHARS:
+            windows.append(section)
+        else:
+            windows.extend(section[i:i + SECTION_LINES] for i in range(0, len(section), SECTION_LINES))
+    return ["\n".join(window) for window in windows]
+
+
+def bm25_scores(sections, query):
+    """Returns: BM25 score of each section against the query text."""
+    docs = [Counter(tokenize(section)) for section in sections]
+    if not docs:
+        return []
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(docs) or 1
+    terms = set(tokenize(query))
+    idf = {}
+    for term in terms:
+        containing = sum(1 for doc in docs if term in doc)
+        idf[term] = math.log(1 + (len(docs) - containing + 0.5) / (containing + 0.5))
+
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in terms:
+            tf = doc.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def compress(resume_text, company_context, token_budget=TOKEN_BUDGET):
+    """
+    Keep the resume sections most relevant to the company context within a token budget.
+    The opening lines are always kept, the remaining sections are ranked with BM25
+    against the context and taken best-first while they fit, and the result keeps
+    document order.
+    Returns: The compressed resume text (the whole text if it already fits).
+    """
+    if estimate_tokens(resume_text) <= token_budget:
+        return resume_text
+    char_budget = token_budget * CHARS_PER_TOKEN
+    sections = split_sections(resume_text)
+    if not sections:
+        return ""
+
+    header = sections[0][:HEADER_CHARS]
+    used = len(header)
+    scores = bm25_scores(sections[1:], company_context)
+    ranked = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+
+    chosen = {}
+    for i in ranked:
+        remaining = char_budget - used
+        if remaining <= 0:
+            break
+        section = sections[i + 1]
+        if len(section) + 2 > remaining:
+            if chosen:
+                continue  # a later, shorter section may still fit
+            section = section[:remaining - 2]  # the best section alone is over budget
+        chosen[i] = section
+        used += len(section) + 2
+    return "\n\n".join([header] + [chosen[i] for i in sorted(chosen)])
@@ -0,0 +1,332 @@
+"""
+Sharded verification across processes, or machines that share one spool file.
+
+A job is enqueued into a SQLite spool with every address assigned to a shard keyed by
+its MX provider (rate_limit.provider_for), so all traffic to one mail provider comes
+from a single worker and its rate limit and circuit breaker still hold. Workers claim
+whole shards under a lease, largest first, and write result rows back to the spool;
+a shard whose worker dies is picked up by another once its lease runs out.
+
+The spool uses SQLite's rollback journal rather than WAL: WAL keeps its index in shared
+memory, which only works for processes on one host. Sharing between machines still needs
+a network filesystem whose file locking works; where locking is unreliable (many NFS
+mounts), run enqueue, workers and merge on one host instead.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import greylist
+import pipeline
+import prefilter
+import rate_limit
+import store
+import utils
+
+logger = utils.logger
+
+LEASE_SECONDS = 120  # a claimed shard is handed to another worker once its lease lapses
+BATCH_SIZE = 500  # addresses verified and written back to the spool at a time
+POLL_SECONDS = 1  # idle workers re-check for lapsed leases this often
+LOCAL_SHARD = "(local)"  # rows settled without SMTP: pre-filtered or no MX
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Spool:
+    """
+    SQLite job spool shared by the enqueuer, any number of worker processes and the merge.
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self._lock = threading.Lock()
+        # Several processes write here; wait on their locks rather than failing
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        with self._lock, self._conn:
+            # Not WAL, so workers on other machines can share the file; see module docstring
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS domains (
+                    domain TEXT PRIMARY KEY,
+                    mx_record TEXT,
+                    has_spf INTEGER,
+                    has_dmarc INTEGER
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    row_index INTEGER PRIMARY KEY,
+                    shard TEXT NOT NULL,
+                    domain TEXT NOT NULL,
+                    email TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_shard ON tasks (shard, row_index)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS shards (
+                    shard TEXT PRIMARY KEY,
+                    rows INTEGER NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    claim TEXT,
+                    worker TEXT,
+                    lease_until REAL NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    row_index INTEGER PRIMARY KEY,
+                    row TEXT NOT NULL
+                )
+            """)
+
+    def enqueue(self, chunks, email_col, dns_workers=32):
+        """
+        Add the rows of an iterable of DataFrame chunks to the spool, resolving each new
+        domain once and sharding rows by MX provider. Rows continue the spool's numbering,
+        so more input can be appended to a spool that is already being worked.
+        Returns: Number of rows added.
+        """
+        with self._lock:
+            start = self._conn.execute("SELECT COALESCE(MAX(row_index) + 1, 0) FROM tasks").fetchone()[0]
+            dns_info = {
+                domain: (mx_record, bool(has_spf), bool(has_dmarc))
+                for domain, mx_record, has_spf, has_dmarc in self._conn.execute("SELECT * FROM domains")
+            }
+        added = 0
+        for chunk in chunks:
+            if email_col not in chunk.columns:
+                raise ValueError(f"Column '{email_col}' not found in input.")
+            checks = prefilter.check(chunk[email_col])
+            checks.index = range(start + added, start + added + len(checks))
+            network = checks["status"].isna()
+            domains = checks["canonical"].str.split('@').str[-1].where(network, "")
+
+            new = utils.preresolve_domains(set(domains[network]) - set(dns_info), dns_workers)
+            dns_info.update(new)
+            shards = [
+                rate_limit.provider_for(dns_info[domain][0]) if domain and dns_info[domain][0] else LOCAL_SHARD
+                for domain in domains
+            ]
+
+            counts = {}
+            for shard in shards:
+                counts[shard] = counts.get(shard, 0) + 1
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO domains (domain, mx_record, has_spf, has_dmarc) VALUES (?, ?, ?, ?)",
+                    [(domain, *info) for domain, info in new.items()],
+                )
+                self._conn.executemany(
+                    "INSERT INTO tasks (row_index, shard, domain, email) VALUES (?, ?, ?, ?)",
+                    zip(checks.index, shards, domains, checks["email"]),
+                )
+                # New rows reopen a finished shard
+                self._conn.executemany(
+                    "INSERT INTO shards (shard, rows) VALUES (?, ?) ON CONFLICT (shard) DO UPDATE "
+                    "SET rows = rows + excluded.rows, "
+                    "state = CASE WHEN state = 'done' THEN 'pending' ELSE state END",
+                    counts.items(),
+                )
+            added += len(checks)
+        return added
+
+    def claim(self, worker):
+        """
+        Claim the largest shard that is pending or whose lease has lapsed.
+        Returns: (shard, claim token), or None when nothing is left to claim.
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            # One UPDATE, so two workers can never claim the same shard
+            self._conn.execute(
+                "UPDATE shards SET state = 'claimed', claim = ?, worker = ?, lease_until = ? "
+                "WHERE shard = (SELECT shard FROM shards WHERE state = 'pending' "
+                "OR (state = 'claimed' AND lease_until < ?) ORDER BY rows DESC LIMIT 1)",
+                (token, worker, now + LEASE_SECONDS, now),
+            )
+            row = self._conn.execute("SELECT shard FROM shards WHERE claim = ?", (token,)).fetchone()
+        return (row[0], token) if row else None
+
+    def renew(self, shard, token):
+        """Extend a claim's lease. Returns: False if the claim was lost to another worker."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE shards SET lease_until = ? WHERE shard = ? AND claim = ? AND state = 'claimed'",
+                (time.time() + LEASE_SECONDS, shard, token),
+            )
+        return cursor.rowcount > 0
+
+    def finish(self, shard, token):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE shards SET state = 'done' WHERE shard = ? AND claim = ?", (shard, token))
+
+    def dns_info(self, shard):
+        """Returns: dns_info dict (see utils.preresolve_domains) for the domains of one shard."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT domain, mx_record, has_spf, has_dmarc FROM domains "
+                "WHERE domain IN (SELECT DISTINCT domain FROM tasks WHERE shard = ?)",
+                (shard,),
+            ).fetchall()
+        return {domain: (mx_record, bool(has_spf), bool(has_dmarc)) for domain, mx_record, has_spf, has_dmarc in rows}
+
+    def tasks(self, shard, after=-1, limit=BATCH_SIZE):
+        """Returns: Up to limit (row_index, email) of a shard past row `after` that have no result yet."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT t.row_index, t.email FROM tasks t LEFT JOIN results r USING (row_index) "
+                "WHERE t.shard = ? AND t.row_index > ? AND r.row_index IS NULL "
+                "ORDER BY t.row_index LIMIT ?",
+                (shard, after, limit),
+            ).fetchall()
+
+    def save_results(self, rows):
+        """Store result row dicts (keyed by their "Original Row ID")."""
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (row_index, row) VALUES (?, ?)",
+                [(row["Original Row ID"], json.dumps(row, default=str)) for row in rows],
+            )
+
+    def unfinished(self):
+        """Returns: Number of shards not done yet."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM shards WHERE state != 'done'").fetchone()[0]
+
+    def progress(self):
+        """Returns: Dict with shard counts per state, total rows and rows with a result."""
+        with self._lock:
+            states = dict(self._conn.execute("SELECT state, COUNT(*) FROM shards GROUP BY state").fetchall())
+            total = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            done = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"shards": states, "rows": total, "rows_done": done}
+
+    def export(self, writer, batch_size=10000):
+        """Write every result, in input row order, to a pipeline.ResultWriter. Returns: rows written."""
+        written = 0
+        after = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT row_index, row FROM results WHERE row_index > ? ORDER BY row_index LIMIT ?",
+                    (after, batch_size),
+                ).fetchall()
+            if not rows:
+                return written
+            writer.write([json.loads(row) for _, row in rows])
+            written += len(rows)
+            after = rows[-1][0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def run_worker(spool_path, worker=None, concurrency=100, per_mx_limit=3, db=None, retry_greylisted=False):
+    """
+    Claim and verify shards of a spool until every shard is done. Run one per process,
+    on as many machines as share the spool file. While other workers hold the last
+    shards, this one waits to take over any whose lease lapses.
+    db: result store path to reuse and save results, or None for no store.
+    Returns: Number of rows this worker wrote results for.
+    """
+    worker = worker or worker_name()
+    spool = Spool(spool_path)
+    result_store = store.ResultStore(db) if db else None
+    done = 0
+    try:
+        while True:
+            claimed = spool.claim(worker)
+            if claimed is None:
+                if not spool.unfinished():
+                    return done
+                time.sleep(POLL_SECONDS)
+                continue
+            shard, token = claimed
+            logger.info(f"{worker} working shard {shard}")
+            done += _run_shard(spool, shard, token, result_store, concurrency, per_mx_limit, retry_greylisted)
+    finally:
+        spool.close()
+        if result_store is not None:
+            result_store.close()
+
+
+def _run_shard(spool, shard, token, result_store, concurrency, per_mx_limit, retry_greylisted):
+    lost = threading.Event()
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(LEASE_SECONDS / 3):
+            if not spool.renew(shard, token):
+                lost.set()
+                return
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    dns_info = spool.dns_info(shard)
+    retry = greylist.RetryScheduler() if retry_greylisted else None
+    done = 0
+    try:
+        after = -1
+        while not lost.is_set():
+            tasks = spool.tasks(shard, after)
+            if not tasks:
+                break
+            after = tasks[-1][0]
+            chunk = pd.DataFrame({"email": [email for _, email in tasks]}, index=[i for i, _ in tasks])
+            rows = pipeline.verify_email_chunk(chunk, "email", result_store, dns_info=dns_info, retry=retry,
+                                               concurrency=concurrency, per_mx_limit=per_mx_limit)
+            if retry is not None:
+                rows += pipeline.retry_email_rows(retry, result_store, dns_info, concurrency=concurrency,
+                                                  per_mx_limit=per_mx_limit)
+            spool.save_results(rows)
+            done += len(rows)
+        if retry is not None and not lost.is_set():
+            rows = pipeline.retry_email_rows(retry, result_store, dns_info, wait=True,
+                                             concurrency=concurrency, per_mx_limit=per_mx_limit)
+            spool.save_results(rows)
+            done += len(rows)
+    finally:
+        stopped.set()
+        beat.join()
+    if lost.is_set():
+        logger.error(f"Lost the lease on shard {shard}; another worker will finish it")
+    else:
+        spool.finish(shard, token)
+    return done
+
+
+def run_local(spool_path, processes, **worker_args):
+    """
+    Drain a spool with a pool of worker processes on this machine.
+    worker_args: as run_worker.
+    Returns: Number of rows verified.
+    """
+    # Spawned, not forked: workers open their own sockets, SQLite connections and event loops
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_worker,
+                             initargs=(logging.getLogger().level,)) as executor:
+        futures = [
+            executor.submit(run_worker, spool_path, f"{socket.gethostname()}:local{i}", **worker_args)
+            for i in range(processes)
+        ]
+        return sum(future.result() for future in futures)
+
+
+def _init_worker(log_level):
+    logging.getLogger().setLevel(log_level)
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+
+import utils
+
+DB_PATH = os.getenv("CODEFORGE_DB", "codeforge.db")
+
+# How long a stored result is reused, per status class (seconds)
+DEFAULT_FRESHNESS = {
+    "Valid": 7 * 24 * 60 * 60,
+    "Invalid": 30 * 24 * 60 * 60,
+    "Risky": 3 * 24 * 60 * 60,
+    "Unknown": 60 * 60,
+}
+
+_COLUMNS = [
+    "status", "reason", "mx_record", "smtp_banner",
+    "has_spf", "has_dmarc", "is_role_account", "is_free_provider",
+]
+_BOOL_COLUMNS = {"has_spf", "has_dmarc", "is_role_account", "is_free_provider"}
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def status_class(status):
+    """Map a status like 'Unknown (Timeout)' to its class, e.g. 'Unknown'."""
+    return status.split(" (")[0]
+
+
+class ResultStore:
+    """
+    Persistent SQLite store of verification results, shared across sessions and jobs.
+    Lookups only return rows younger than the freshness window for their status class.
+    """
+
+    def __init__(self, path=DB_PATH, freshness=None):
+        self.path = path
+        self.freshness = dict(DEFAULT_FRESHNESS)
+        if freshness:
+            self.freshness.update(freshness)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    email TEXT PRIMARY KEY,
+                    domain TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    reason TEXT,
+                    mx_record TEXT,
+                    smtp_banner TEXT,
+                    has_spf INTEGER,
+                    has_dmarc INTEGER,
+                    is_role_account INTEGER,
+                    is_free_provider INTEGER,
+                    checked_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_domain ON results (domain)")
+
+    def get(self, email):
+        return self.get_many([email]).get(email)
+
+    def get_many(self, emails):
+        """
+        Look up fresh results.
+        Returns: Dict mapping each input email that has a fresh row to its details dict.
+        """
+        wanted = {}
+        for email in emails:
+            wanted.setdefault(normalize_email(email), []).append(email)
+        if not wanted:
+            return {}
+
+        rows = []
+        keys = list(wanted)
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows.extend(self._conn.execute(
+                    f"SELECT email, checked_at, {', '.join(_COLUMNS)} FROM results "
+                    f"WHERE email IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall())
+
+        now = time.time()
+        found = {}
+        for row in rows:
+            details = dict(zip(_COLUMNS, row[2:]))
+            max_age = self.freshness.get(status_class(details["status"]), 0)
+            if now - row[1] > max_age:
+                continue
+            for column in _BOOL_COLUMNS:
+                details[column] = bool(details[column])
+            details["checked_at"] = row[1]
+            details["cached"] = True
+            for email in wanted[row[0]]:
+                found[email] = dict(details)
+        return found
+
+    def save(self, email, details):
+        self.save_many({email: details})
+
+    def save_many(self, results):
+        """
+        Store a dict of email -> details. Predicted results, temporary 4xx
+        failures (which are retried, not remembered) and circuit breaker
+        fast-fails (the address was never checked) are not stored.
+        """
+        now = time.time()
+        rows = []
+        for email, details in results.items():
+            if details.get("cached") or "Predicted" in details["status"] or utils.is_temporary_failure(details):
+                continue
+            if details["status"] == "Unknown (MX Unavailable)":
+                continue
+            key = normalize_email(email)
+            values = [details.get(c) for c in _COLUMNS]
+            rows.append([key, key.split('@')[-1]] + values + [now])
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO results (email, domain, {', '.join(_COLUMNS)}, checked_at) "
+                f"VALUES ({', '.join('?' * (len(_COLUMNS) + 3))})",
+                rows,
+            )
+
+    def purge_expired(self):
+        """Delete rows older than the longest freshness window. Returns the number removed."""
+        cutoff = time.time() - max(self.freshness.values())
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM results WHERE checked_at < ?", (cutoff,)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
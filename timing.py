@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Verification stages, in dialogue order. "throttle" is time spent waiting on the rate limiter.
+STAGES = ("dns", "throttle", "connect", "banner", "helo", "mail", "rcpt")
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def add(timings, stage, seconds):
+    """Add seconds to a stage in a timings dict (details["timings"])."""
+    timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def add_connect(timings, started, connected_at, finished):
+    """
+    Split a connect attempt into connect (TCP handshake) and banner (waiting for the
+    greeting) at connected_at; without it the TCP connection never came up.
+    """
+    if connected_at is None:
+        add(timings, "connect", finished - started)
+    else:
+        add(timings, "connect", connected_at - started)
+        add(timings, "banner", finished - connected_at)
+
+
+@contextmanager
+def span(timings, stage):
+    """Time the body of a with block into timings[stage]."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(timings, stage, time.perf_counter() - started)
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+    def to_dict(self):
+        return {"buckets": list(self.buckets), "count": self.count, "sum": self.sum}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets = list(data["buckets"])
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        return histogram
+
+
+class TimingStats:
+    """
+    Per-stage timing histograms of verification results, aggregated by domain and by
+    MX host, for finding what dominates a job's wall-clock time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {"domain": {}, "mx": {}}
+        self._results = {"domain": {}, "mx": {}}
+
+    def add(self, email, details):
+        """Record one result's details["timings"]; results without timings are ignored."""
+        timings = details.get("timings")
+        if not timings:
+            return
+        keys = {"domain": email.split('@')[-1].lower(), "mx": details.get("mx_record") or "(none)"}
+        with self._lock:
+            for label, key in keys.items():
+                self._results[label][key] = self._results[label].get(key, 0) + 1
+                stages = self._histograms[label].setdefault(key, {})
+                for stage, seconds in timings.items():
+                    stages.setdefault(stage, _Histogram()).observe(seconds)
+
+    def summary(self, by="mx", limit=50):
+        """
+        Returns: List of row dicts (total and per-stage seconds) for the `limit` domains
+        or MX hosts with the most total time, slowest first.
+        """
+        with self._lock:
+            rows = []
+            for key, stages in self._histograms[by].items():
+                row = {by: key, "results": self._results[by].get(key, 0)}
+                row.update({f"{stage}_s": round(stages[stage].sum, 3) for stage in STAGES if stage in stages})
+                row["total_s"] = round(sum(h.sum for h in stages.values()), 3)
+                rows.append(row)
+        rows.sort(key=lambda r: -r["total_s"])
+        return rows[:limit]
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "buckets": list(BUCKETS),
+                "results": {label: dict(counts) for label, counts in self._results.items()},
+                "histograms": {
+                    label: {key: {stage: h.to_dict() for stage, h in stages.items()}
+                            for key, stages in groups.items()}
+                    for label, groups in self._histograms.items()
+                },
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for label in ("domain", "mx"):
+            stats._results[label] = dict(data.get("results", {}).get(label, {}))
+            stats._histograms[label] = {
+                key: {stage: _Histogram.from_dict(h) for stage, h in stages.items()}
+                for key, stages in data.get("histograms", {}).get(label, {}).items()
+            }
+        return stats
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format, one histogram family per grouping."""
+        data = self.to_dict()
+        lines = []
+        for label, groups in data["histograms"].items():
+            metric = f"codeforge_{label}_stage_seconds"
+            lines.append(f"# HELP {metric} Time spent per verification stage, by {label}.")
+            lines.append(f"# TYPE {metric} histogram")
+            for key, stages in sorted(groups.items()):
+                for stage, h in sorted(stages.items()):
+                    labels = f'{label}="{_escape(key)}",stage="{stage}"'
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, h["buckets"]):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {h["count"]}')
+                    lines.append(f"{metric}_sum{{{labels}}} {h['sum']:.6f}")
+                    lines.append(f"{metric}_count{{{labels}}} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def __len__(self):
+        with self._lock:
+            return sum(self._results["mx"].values())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,20 +1,83 @@
 import smtplib
-import dns.resolver
-import pandas as pd
+import hashlib
+import io
 import logging
+import mmap
+import multiprocessing
+import os
 import random
+import signal
 import string
 import socket
-from pypdf import PdfReader
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import mx_health
+import rate_limit
+import timing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# SMTP endpoint settings; the port is only changed for local test servers
+SMTP_PORT = int(os.getenv("CODEFORGE_SMTP_PORT", "25"))
+SMTP_TIMEOUT = 10  # seconds
+
+# Catch-all status per (domain, MX), shared by every verifier and bulk job
+CATCH_ALL_TTL = 6 * 60 * 60  # seconds
+_catch_all_cache = {}
+# Probe address per (domain, MX) until a definite answer is cached; reused so a greylisting
+# server sees the same (sender, recipient, IP) triplet on retry and lets it through
+_catch_all_probes = {}
+_catch_all_lock = threading.Lock()
+
+# Parsed DNS answers (MX hosts, TXT strings) cached up to their TTL; NXDOMAIN/NoAnswer
+# cached for DNS_NEGATIVE_TTL. Least recently used entries go first past DNS_CACHE_SIZE.
+DNS_NEGATIVE_TTL = 5 * 60  # seconds
+DNS_CACHE_SIZE = int(os.getenv("CODEFORGE_DNS_CACHE_SIZE", "100000"))
+_dns_cache = OrderedDict()
+_dns_lock = threading.Lock()
+_dns_stats = {"hits": 0, "negative_hits": 0, "misses": 0}
+
+# Extracted resume text keyed by a hash of the PDF bytes, least recently used evicted first
+PDF_CACHE_SIZE = 32
+_pdf_text_cache = OrderedDict()
+_pdf_lock = threading.Lock()
+
+# Bounds on resume parsing, so a huge or hostile PDF cannot stall the app
+PDF_TIMEOUT = 20  # seconds before extraction gives up and returns what it has
+PDF_MAX_BYTES = 20 * 1024 * 1024
+PDF_MAX_PAGES = 50
+PDF_PARALLEL_MIN_PAGES = 8  # smaller documents are not worth a process pool
+
+# Local-part patterns in default probe order, as (name, template)
+EMAIL_PATTERNS = [
+    ("first.last", "{fn}.{ln}"),
+    ("first", "{fn}"),
+    ("firstlast", "{fn}{ln}"),
+    ("f.last", "{f}.{ln}"),
+    ("flast", "{f}{ln}"),
+    ("first_last", "{fn}_{ln}"),
+    ("last.first", "{ln}.{fn}"),
+    ("last", "{ln}"),
+    ("f_last", "{f}_{ln}"),
+]
+
 def generate_permutations(first_name, last_name, domain):
     """
     Generate standard email permutations for a given name and domain.
     """
+    return [email for _, email in generate_pattern_candidates(first_name, last_name, domain, dedupe=False)]
+
+def generate_pattern_candidates(first_name, last_name, domain, pattern_stats=None, dedupe=True):
+    """
+    Generate (pattern, email) candidates for a name and domain.
+    With pattern_stats ({domain: {pattern: hits}}), patterns that have hit most
+    often on this domain come first; ties keep the default EMAIL_PATTERNS order.
+    """
     fn = first_name.lower().strip()
     ln = last_name.lower().strip()
     d = domain.lower().strip()
@@ -22,160 +85,872 @@ def generate_permutations(first_name, last_name, domain):
     if not fn or not ln or not d:
         return []
 
-    permutations = [
-        f"{fn}.{ln}@{d}",       # first.last
-        f"{fn}@{d}",            # first
-        f"{fn}{ln}@{d}",        # firstlast
-        f"{fn[0]}.{ln}@{d}",    # f.last
-        f"{fn[0]}{ln}@{d}",     # flast
-        f"{fn}_{ln}@{d}",       # first_last
-        f"{ln}.{fn}@{d}",       # last.first
-        f"{ln}@{d}",            # last
-        f"{fn[0]}_{ln}@{d}",    # f_last
+    candidates = [
+        (name, template.format(fn=fn, ln=ln, f=fn[0]) + f"@{d}")
+        for name, template in EMAIL_PATTERNS
     ]
-    return permutations
+    if dedupe:
+        seen = set()
+        candidates = [c for c in candidates if not (c[1] in seen or seen.add(c[1]))]
+    if pattern_stats:
+        hits = pattern_stats.get(d, {})
+        candidates.sort(key=lambda c: -hits.get(c[0], 0))
+    return candidates
+
+def record_pattern_hit(pattern_stats, domain, pattern):
+    """Count a confirmed hit for pattern on domain in a job's pattern_stats dict."""
+    domain_stats = pattern_stats.setdefault(domain.lower().strip(), {})
+    domain_stats[pattern] = domain_stats.get(pattern, 0) + 1
+
+def find_email(first_name, last_name, domain, pattern_stats=None, stop_on_valid=True,
+               sender_email="test@example.com", store=None, dns_info=None):
+    """
+    Probe a person's permutations in likely order over one SMTP session.
+    In find mode (stop_on_valid) probing stops at the first non-catch-all Valid hit,
+    and that hit is recorded in pattern_stats to reorder later people on the domain.
+    Returns: List of (email, details) for the candidates that were checked, in probe order.
+    """
+    candidates = generate_pattern_candidates(first_name, last_name, domain, pattern_stats)
+    results = verify_emails_smtp([email for _, email in candidates], sender_email,
+                                 stop_on_valid=stop_on_valid, store=store, dns_info=dns_info)
+
+    checked = []
+    for pattern, email in candidates:
+        if email not in results:
+            continue
+        details = results[email]
+        if details["status"] == "Valid" and pattern_stats is not None:
+            record_pattern_hit(pattern_stats, domain, pattern)
+        checked.append((email, details))
+        if stop_on_valid and details["status"] == "Valid":
+            # Stored results for later candidates add nothing once one is Valid
+            break
+    return checked
+
+class DomainPatternModel:
+    """
+    Learns each domain's address format from confirmed results and predicts
+    addresses for the remaining people, so repeat companies skip most SMTP work.
+    `stats` has the same {domain: {pattern: hits}} shape as find_email's pattern_stats.
+    """
+
+    def __init__(self, min_confidence=0.75, spot_check_every=10, store=None):
+        self.min_confidence = min_confidence
+        self.spot_check_every = spot_check_every
+        self.store = store
+        self.stats = {}
+        self.misses = {}
+        self._trusted = 0
+
+    def predict(self, first_name, last_name, domain):
+        """
+        Predict an address from the domain's most-confirmed pattern.
+        Returns: (email, pattern, confidence) or None if nothing is known for the domain.
+        """
+        d = domain.lower().strip()
+        hits = self.stats.get(d)
+        if not hits:
+            return None
+        candidates = generate_pattern_candidates(first_name, last_name, d, self.stats)
+        if not candidates:
+            return None
+        pattern, email = candidates[0]
+        misses = self.misses.get(d, {}).get(pattern, 0)
+        confidence = hits.get(pattern, 0) / (sum(hits.values()) + misses + 1)
+        return email, pattern, round(confidence, 3)
+
+    def find_email(self, first_name, last_name, domain, sender_email="test@example.com", dns_info=None):
+        """
+        Like utils.find_email in find mode, but returns a prediction without any
+        SMTP traffic when confidence is high. Every spot_check_every-th trusted
+        prediction is still probed live, and a rejected prediction counts as a miss.
+        Returns: List of (email, details), as utils.find_email.
+        """
+        prediction = self.predict(first_name, last_name, domain)
+        if prediction and prediction[2] >= self.min_confidence:
+            self._trusted += 1
+            if self._trusted % self.spot_check_every:
+                return [(prediction[0], self._predicted_details(*prediction))]
+
+        checked = find_email(first_name, last_name, domain, self.stats, True, sender_email, self.store,
+                             dns_info)
+        if prediction:
+            email, pattern, _ = prediction
+            for checked_email, details in checked:
+                if checked_email == email and details["status"] == "Invalid":
+                    domain_misses = self.misses.setdefault(domain.lower().strip(), {})
+                    domain_misses[pattern] = domain_misses.get(pattern, 0) + 1
+        return checked
+
+    def _predicted_details(self, email, pattern, confidence):
+        domain = email.split('@')[-1]
+        # DNS answers are cached by now, so this stays local
+        details = _base_details(email, *resolve_domain(domain))
+        confirmed = self.stats[domain].get(pattern, 0)
+        details["status"] = "Valid (Predicted)"
+        details["reason"] = f"Matches the {pattern} format of {confirmed} confirmed addresses on this domain."
+        details["confidence"] = confidence
+        return details
+
+def _dns_cache_get(name, rdtype):
+    """
+    Return the cached records for (name, rdtype), or None on a miss.
+    Re-raises cached NXDOMAIN/NoAnswer results. Expired entries are deleted here.
+    """
+    key = (name.lower().rstrip('.'), rdtype)
+    with _dns_lock:
+        entry = _dns_cache.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            _dns_cache.move_to_end(key)
+            records = entry[0]
+            if isinstance(records, Exception):
+                _dns_stats["negative_hits"] += 1
+                raise records.with_traceback(None)
+            _dns_stats["hits"] += 1
+            return records
+        if entry is not None:
+            del _dns_cache[key]
+        _dns_stats["misses"] += 1
+    return None
+
+def _dns_cache_put(name, rdtype, answer):
+    """
+    Store an answer (or an NXDOMAIN/NoAnswer exception) for its TTL. Only the parsed
+    records are kept, not dnspython's Answer.
+    Returns: The records, as resolve_cached.
+    """
+    key = (name.lower().rstrip('.'), rdtype)
+    if isinstance(answer, Exception):
+        records, ttl = answer.with_traceback(None), DNS_NEGATIVE_TTL
+    else:
+        records = _parse_records(rdtype, answer)
+        ttl = answer.rrset.ttl if answer.rrset is not None else DNS_NEGATIVE_TTL
+    if ttl > 0:
+        with _dns_lock:
+            _dns_cache[key] = (records, time.monotonic() + ttl)
+            _dns_cache.move_to_end(key)
+            while len(_dns_cache) > DNS_CACHE_SIZE:
+                _dns_cache.popitem(last=False)
+    return records
+
+def _parse_records(rdtype, answer):
+    if rdtype == 'MX':
+        # Sort by preference; equal preferences keep a stable order
+        hosts = [r.exchange.to_text().rstrip('.') for r in sorted(answer, key=lambda r: r.preference)]
+        return tuple(dict.fromkeys(hosts))
+    return tuple(rdata.to_text().strip('"') for rdata in answer)
+
+def resolve_cached(name, rdtype):
+    """
+    Resolve a DNS query through the shared TTL cache.
+    Returns: tuple of MX hosts, most preferred first, or of TXT strings.
+    Raises the same dns.resolver exceptions as dns.resolver.resolve.
+    """
+    answer = _dns_cache_get(name, rdtype)
+    if answer is not None:
+        return answer
+
+    # dnspython is only loaded once a lookup misses the cache
+    import dns.resolver
+    try:
+        answer = dns.resolver.resolve(name, rdtype)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+        _dns_cache_put(name, rdtype, e)
+        raise
+    return _dns_cache_put(name, rdtype, answer)
+
+def get_dns_cache_stats():
+    """Return hit/miss counters and the current size of the DNS cache."""
+    with _dns_lock:
+        stats = dict(_dns_stats)
+        stats["size"] = len(_dns_cache)
+    lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] + stats["negative_hits"]) / lookups if lookups else 0.0
+    return stats
+
+def clear_dns_cache():
+    """Drop all cached DNS answers and reset the counters."""
+    with _dns_lock:
+        _dns_cache.clear()
+        for k in _dns_stats:
+            _dns_stats[k] = 0
 
 def get_mx_record(domain):
     """Get the primary MX record for a domain."""
     try:
-        answers = dns.resolver.resolve(domain, 'MX')
-        # Sort by preference and return the first one
-        mx_record = sorted([(r.preference, r.exchange.to_text()) for r in answers])[0][1]
-        return mx_record.rstrip('.')
+        return _primary_mx(resolve_cached(domain, 'MX'))
     except Exception as e:
         logger.error(f"DNS Lookup failed for {domain}: {e}")
         return None
 
+def get_mx_records(domain):
+    """Get every MX host for a domain, most preferred first. Returns [] if there are none."""
+    try:
+        return _mx_hosts(resolve_cached(domain, 'MX'))
+    except Exception as e:
+        logger.error(f"DNS Lookup failed for {domain}: {e}")
+        return []
+
 def check_dns_txt(domain, prefix):
     """Check for existence of TXT records starting with prefix (e.g., v=spf1)."""
     try:
-        answers = dns.resolver.resolve(domain, 'TXT')
-        for rdata in answers:
-            txt_record = rdata.to_text().strip('"')
-            if txt_record.startswith(prefix):
-                return True
+        return _has_txt_prefix(resolve_cached(domain, 'TXT'), prefix)
     except:
-        pass
-    return False
+        return False
+
+def _primary_mx(hosts):
+    return hosts[0]
+
+def _mx_hosts(hosts):
+    return list(hosts)
+
+def _has_txt_prefix(records, prefix):
+    return any(record.startswith(prefix) for record in records)
 
-def verify_email_smtp(email, sender_email="test@example.com"):
+def resolve_domain(domain):
+    """Returns: (mx_record, has_spf, has_dmarc) for a domain."""
+    return (
+        get_mx_record(domain),
+        check_dns_txt(domain, "v=spf1"),
+        check_dns_txt(f"_dmarc.{domain}", "v=DMARC1"),
+    )
+
+def preresolve_domains(domains, max_workers=32):
     """
-    Verify email and return detailed analysis.
-    Returns: Dict with status, mx, banner, and other metadata.
+    Resolve MX, SPF and DMARC for every unique domain concurrently, warming the DNS cache
+    before any SMTP work starts.
+    Returns: Dict mapping each domain to (mx_record, has_spf, has_dmarc); mx_record is None for dead domains.
     """
-    domain = email.split('@')[-1]
-    local_part = email.split('@')[0]
-    
-    # FREE PROVIDER CHECK
-    free_providers = {'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com', 'icloud.com'}
-    is_free = domain in free_providers
-    
-    # ROLE ACCOUNT CHECK
-    role_accounts = {'admin', 'support', 'info', 'sales', 'contact', 'hello', 'jobs', 'billing'}
-    is_role = local_part in role_accounts
+    domains = sorted({d.lower().strip() for d in domains if d and d.strip()})
+    if not domains:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(domains))) as executor:
+        return dict(zip(domains, executor.map(resolve_domain, domains)))
 
-    # DNS CHECKS
-    mx_record = get_mx_record(domain)
-    has_spf = check_dns_txt(domain, "v=spf1")
-    has_dmarc = check_dns_txt(f"_dmarc.{domain}", "v=DMARC1")
+FREE_PROVIDERS = {'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com', 'icloud.com'}
+ROLE_ACCOUNTS = {'admin', 'support', 'info', 'sales', 'contact', 'hello', 'jobs', 'billing'}
 
-    details = {
+def _base_details(email, mx_record, has_spf, has_dmarc):
+    """Build the details dict shared by the single and batch verifiers."""
+    domain = email.split('@')[-1]
+    local_part = email.split('@')[0]
+    return {
         "status": "Unknown",
         "mx_record": mx_record,
         "smtp_banner": None,
         "has_spf": has_spf,
         "has_dmarc": has_dmarc,
-        "is_role_account": is_role,
-        "is_free_provider": is_free,
+        "is_role_account": local_part in ROLE_ACCOUNTS,
+        "is_free_provider": domain in FREE_PROVIDERS,
         "reason": ""
     }
 
+# 4xx replies that mean "try again later" (greylisting, rate limits, busy servers)
+TEMPORARY_SMTP_CODES = {421, 450, 451, 452}
+
+def is_temporary_failure(details):
+    """True if a result came from a temporary 4xx reply and is worth retrying later."""
+    return details.get("smtp_code") in TEMPORARY_SMTP_CODES
+
+def _apply_connect_fail(details, code):
+    details["smtp_code"] = code
+    details["status"] = "Unknown (Connect Fail)"
+    details["reason"] = f"Server returned code {code} on connect."
+
+def _apply_rcpt_result(details, code, catch_all):
+    """Set status/reason on details from an RCPT TO response code."""
+    details["smtp_code"] = code
+    if code == 250:
+        if catch_all:
+            details["status"] = "Risky (Catch-All)"
+            details["reason"] = "Server accepts all emails (Catch-All)."
+        else:
+            details["status"] = "Valid"
+            details["reason"] = "SMTP handshake successful."
+    elif code == 550:
+        details["status"] = "Invalid"
+        details["reason"] = "User unknown (550 Error)."
+    else:
+        details["status"] = f"Unknown ({code})"
+        details["reason"] = f"Unexpected SMTP response: {code}"
+
+def _apply_catch_all_unknown(details, probe_code):
+    """The address was accepted but the catch-all probe got a temporary reply, so nothing is settled."""
+    details["smtp_code"] = probe_code
+    details["status"] = f"Unknown ({probe_code})"
+    details["reason"] = f"Address accepted, but the catch-all check got a temporary {probe_code} reply."
+
+def _is_timeout(e):
+    """
+    True for a socket timeout, including one smtplib re-raised as SMTPServerDisconnected
+    while reading a reply (a banner or command that never answered).
+    """
+    return isinstance(e, socket.timeout) or (
+        isinstance(e, smtplib.SMTPServerDisconnected) and isinstance(e.__context__, socket.timeout)
+    )
+
+def _apply_smtp_error(details, email, e):
+    """Set status/reason on details from an exception raised during the SMTP dialogue."""
+    if isinstance(e, mx_health.MXUnavailable):
+        details["status"] = "Unknown (MX Unavailable)"
+        details["reason"] = str(e)
+    elif _is_timeout(e):
+        details["status"] = "Unknown (Timeout)"
+        details["reason"] = "Connection timed out."
+    elif isinstance(e, socket.error):
+        logger.error(f"Socket error for {email}: {e}")
+        details["status"] = "Unknown (Connection Error)"
+        details["reason"] = str(e)
+    else:
+        logger.error(f"Validation error for {email}: {e}")
+        details["status"] = "Unknown"
+        details["reason"] = str(e)
+
+def _failover_hosts(domain, mx_record):
+    """Returns: mx_record followed by the domain's other MX hosts in preference order."""
+    return [mx_record] + [h for h in get_mx_records(domain) if h.lower() != mx_record.lower()]
+
+class _TimedSMTP(smtplib.SMTP):
+    """smtplib.SMTP that notes when the TCP connection is up, to split connect time from banner wait."""
+
+    connected_at = None
+
+    def _get_socket(self, host, port, timeout):
+        sock = super()._get_socket(host, port, timeout)
+        self.connected_at = time.perf_counter()
+        return sock
+
+def _connect_smtp(hosts, timings=None):
+    """
+    Connect to the first MX host that answers, in order, skipping hosts whose circuit
+    is open (see mx_health) and falling through to the next host on connection errors,
+    timeouts and non-220 greetings.
+    Time spent is added to the timings dict under throttle, connect and banner.
+    Returns: (server, host, code, banner); a non-220 code means no host accepted us.
+    Raises: The last connection error, or mx_health.MXUnavailable if every host was skipped.
+    """
+    timings = {} if timings is None else timings
+    refused = None
+    error = None
+    for host in hosts:
+        if not mx_health.tracker.allow(host):
+            continue
+        server = _TimedSMTP(timeout=SMTP_TIMEOUT)
+        server.set_debuglevel(0)
+        with timing.span(timings, "throttle"):
+            rate_limit.limiter.acquire(host)
+        started = time.perf_counter()
+        try:
+            code, banner = server.connect(host, SMTP_PORT)
+        except OSError as e:
+            # A tarpit (TCP up, no greeting) shows as banner time, not connect time
+            timing.add_connect(timings, started, server.connected_at, time.perf_counter())
+            mx_health.tracker.record_failure(host, "timeout" if _is_timeout(e) else "connect")
+            server.close()
+            error = e
+            continue
+        latency = time.perf_counter() - started
+        timing.add_connect(timings, started, server.connected_at, started + latency)
+        rate_limit.limiter.record_latency(host, latency)
+        rate_limit.limiter.record_reply(host, code)
+        if refused is not None:
+            refused[0].close()
+        if code == 220:
+            mx_health.tracker.record_success(host, latency)
+            return server, host, code, banner
+        mx_health.tracker.record_failure(host)
+        refused = (server, host, code, banner)
+
+    if refused is not None:
+        return refused
+    if error is not None:
+        raise error
+    raise mx_health.MXUnavailable(hosts)
+
+def _rcpt(server, host, address, timings=None):
+    """RCPT TO through the provider rate limiter. Returns: (code, message)"""
+    timings = {} if timings is None else timings
+    with timing.span(timings, "throttle"):
+        rate_limit.limiter.acquire(host)
+    with timing.span(timings, "rcpt"):
+        code, message = server.rcpt(address)
+    rate_limit.limiter.record_reply(host, code)
+    return code, message
+
+def _helo(server, timings):
+    with timing.span(timings, "helo"):
+        server.helo(server.local_hostname or 'localhost')
+
+def _mail(server, sender_email, timings):
+    # RSET + MAIL FROM ahead of each RCPT
+    with timing.span(timings, "mail"):
+        server.rset()
+        server.mail(sender_email)
+
+def _record_dialogue_error(host, e):
+    # A host that times out mid-dialogue counts against its circuit too
+    if host and _is_timeout(e):
+        mx_health.tracker.record_failure(host, "timeout")
+
+def verify_email_smtp(email, sender_email="test@example.com", store=None):
+    """
+    Verify email and return detailed analysis.
+    With a store (store.ResultStore), a fresh stored result is returned without
+    touching the network, and new results are saved to it.
+    Returns: Dict with status, mx, banner, and other metadata.
+    """
+    if store is not None:
+        details = store.get(email)
+        if details is None:
+            details = verify_email_smtp(email, sender_email)
+            store.save(email, details)
+        return details
+
+    domain = email.split('@')[-1]
+
+    # DNS CHECKS
+    timings = {}
+    with timing.span(timings, "dns"):
+        mx_record = get_mx_record(domain)
+        has_spf = check_dns_txt(domain, "v=spf1")
+        has_dmarc = check_dns_txt(f"_dmarc.{domain}", "v=DMARC1")
+
+    details = _base_details(email, mx_record, has_spf, has_dmarc)
+    details["timings"] = timings
+
     if not mx_record:
         details["status"] = "Unknown (No MX)"
         details["reason"] = "No MX records found for domain."
         return details
 
+    # Known catch-all domains accept everything, so the RCPT round-trip tells us nothing
+    if get_cached_catch_all(domain, mx_record):
+        _apply_rcpt_result(details, 250, True)
+        return details
+
+    host = None
     try:
-        # Create SMTP connection
-        server = smtplib.SMTP(timeout=10)
-        server.set_debuglevel(0)
-        
-        # Connect to MX server
-        code, banner = server.connect(mx_record, 25)
+        # Connect to the first healthy MX server
+        server, host, code, banner = _connect_smtp(_failover_hosts(domain, mx_record), timings)
+        details["mx_record"] = host
         details["smtp_banner"] = str(banner) # Convert bytes or varying format to string
         
         if code != 220:
             server.quit()
-            details["status"] = "Unknown (Connect Fail)"
-            details["reason"] = f"Server returned code {code} on connect."
+            _apply_connect_fail(details, code)
             return details
 
-        server.helo(server.local_hostname or 'localhost')
-        server.mail(sender_email)
+        _helo(server, timings)
+        with timing.span(timings, "mail"):
+            server.mail(sender_email)
         
         # Check the specific email
-        code, message = server.rcpt(email)
+        code, message = _rcpt(server, host, email, timings)
+
+        # Email accepted, now check for Catch-All (cached per domain/MX). A greylisted address
+        # is probed too, so the server has seen both triplets by the retry (421 closes the session).
+        catch_all = False
+        probe_code = None
+        if code == 250 or code in TEMPORARY_SMTP_CODES - {421}:
+            catch_all = get_cached_catch_all(domain, host)
+            if catch_all is None:
+                catch_all, probe_code = _probe_catch_all(server, domain, host, sender_email, timings)
         server.quit()
 
-        if code == 250:
-            # Email accepted, now check for Catch-All
-            if is_catch_all(domain, mx_record, sender_email):
-                details["status"] = "Risky (Catch-All)"
-                details["reason"] = "Server accepts all emails (Catch-All)."
-            else:
-                details["status"] = "Valid"
-                details["reason"] = "SMTP handshake successful."
-        elif code == 550:
-            details["status"] = "Invalid"
-            details["reason"] = "User unknown (550 Error)."
+        if code == 250 and catch_all is None:
+            _apply_catch_all_unknown(details, probe_code)
         else:
-            details["status"] = f"Unknown ({code})"
-            details["reason"] = f"Unexpected SMTP response: {code}"
+            _apply_rcpt_result(details, code, catch_all)
 
-    except socket.timeout:
-        details["status"] = "Unknown (Timeout)"
-        details["reason"] = "Connection timed out."
-    except socket.error as e:
-        logger.error(f"Socket error for {email}: {e}")
-        details["status"] = "Unknown (Connection Error)"
-        details["reason"] = str(e)
     except Exception as e:
-        logger.error(f"Validation error for {email}: {e}")
-        details["status"] = "Unknown"
-        details["reason"] = str(e)
+        _record_dialogue_error(host, e)
+        _apply_smtp_error(details, email, e)
         
     return details
 
+def verify_emails_smtp(emails, sender_email="test@example.com", stop_on_valid=False, store=None,
+                       dns_info=None):
+    """
+    Verify many emails, reusing one SMTP session per MX host.
+    Each address is checked with its own MAIL FROM/RCPT TO, separated by RSET,
+    instead of a fresh connect/HELO per address.
+    With stop_on_valid, a domain's remaining addresses are skipped (and left out
+    of the result) once one of them comes back Valid.
+    With a store, fresh stored results are reused and new ones are saved.
+    dns_info ({domain: (mx_record, has_spf, has_dmarc)}, see preresolve_domains)
+    skips the DNS lookups for domains resolved ahead of time.
+    Returns: Dict mapping each email to the same details dict as verify_email_smtp.
+    """
+    results = {}
+    dns_info = dict(dns_info or {})
+    by_mx = {}
+
+    cached = store.get_many(emails) if store is not None else {}
+    found = set()
+    if stop_on_valid:
+        found = {e.split('@')[-1] for e, d in cached.items() if d["status"] == "Valid"}
+
+    for email in dict.fromkeys(emails):
+        domain = email.split('@')[-1]
+        if email in cached:
+            results[email] = cached[email]
+            continue
+        if domain in found:
+            continue
+        timings = {}
+        if domain not in dns_info:
+            # Charged to the first address on the domain; the rest reuse the answer
+            with timing.span(timings, "dns"):
+                dns_info[domain] = resolve_domain(domain)
+        mx_record, has_spf, has_dmarc = dns_info[domain]
+        details = _base_details(email, mx_record, has_spf, has_dmarc)
+        details["timings"] = timings
+        results[email] = details
+
+        if not mx_record:
+            details["status"] = "Unknown (No MX)"
+            details["reason"] = "No MX records found for domain."
+        else:
+            by_mx.setdefault(mx_record, []).append(email)
+
+    for mx_record, mx_emails in by_mx.items():
+        pending = []
+        for email in mx_emails:
+            if get_cached_catch_all(email.split('@')[-1], mx_record):
+                _apply_rcpt_result(results[email], 250, True)
+            else:
+                pending.append(email)
+        if pending:
+            _verify_session(mx_record, pending, results, sender_email, stop_on_valid)
+
+    if store is not None:
+        store.save_many({e: d for e, d in results.items() if e not in cached})
+
+    return results
+
+def _verify_session(mx_record, emails, results, sender_email, stop_on_valid=False):
+    """
+    Run RCPT TO for every email in one SMTP session and fill in their details.
+    The session goes to mx_record, or to the next healthy MX host of the first
+    email's domain if it is down.
+    Session setup (connect, HELO, catch-all probes) is timed on the first email.
+    """
+    codes = {}
+    catch_all = {}
+    probe_codes = {}
+    found = set()
+    host = None
+    session_timings = results[emails[0]].setdefault("timings", {})
+    try:
+        server, host, code, banner = _connect_smtp(_failover_hosts(emails[0].split('@')[-1], mx_record),
+                                                   session_timings)
+        for email in emails:
+            results[email]["mx_record"] = host
+            results[email]["smtp_banner"] = str(banner)
+
+        if code != 220:
+            server.quit()
+            for email in emails:
+                _apply_connect_fail(results[email], code)
+            return
+
+        _helo(server, session_timings)
+
+        # Settle Catch-All first so those domains skip the per-address RCPTs
+        for domain in dict.fromkeys(e.split('@')[-1] for e in emails):
+            cached = get_cached_catch_all(domain, host)
+            if cached is None:
+                cached, probe_codes[domain] = _probe_catch_all(server, domain, host, sender_email,
+                                                               session_timings)
+            catch_all[domain] = cached
+
+        for email in emails:
+            domain = email.split('@')[-1]
+            if catch_all[domain]:
+                codes[email] = 250
+                continue
+            if domain in found:
+                continue
+            timings = results[email].setdefault("timings", {})
+            _mail(server, sender_email, timings)
+            codes[email], _ = _rcpt(server, host, email, timings)
+            if stop_on_valid and codes[email] == 250:
+                found.add(domain)
+
+        server.quit()
+    except Exception as e:
+        _record_dialogue_error(host, e)
+        for email in emails:
+            if email not in codes and email.split('@')[-1] not in found:
+                _apply_smtp_error(results[email], email, e)
+
+    for email in emails:
+        if email not in codes and email.split('@')[-1] in found:
+            del results[email]
+
+    for email, code in codes.items():
+        domain = email.split('@')[-1]
+        if code == 250 and domain in catch_all and catch_all[domain] is None:
+            _apply_catch_all_unknown(results[email], probe_codes[domain])
+        else:
+            _apply_rcpt_result(results[email], code, catch_all.get(domain, False))
+
+def get_cached_catch_all(domain, mx_record):
+    """Return the cached catch-all status for (domain, MX), or None if unknown or expired."""
+    key = (domain.lower(), mx_record.lower())
+    with _catch_all_lock:
+        entry = _catch_all_cache.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del _catch_all_cache[key]
+            return None
+        return value
+
+def _set_cached_catch_all(domain, mx_record, value):
+    key = (domain.lower(), mx_record.lower())
+    with _catch_all_lock:
+        _catch_all_cache[key] = (value, time.monotonic() + CATCH_ALL_TTL)
+        _catch_all_probes.pop(key, None)
+
+def catch_all_probe_address(domain, mx_record):
+    """
+    The made-up address the catch-all probe sends to (domain, MX). Generated once and kept
+    until the probe gets a definite answer, so retries after a greylisting 4xx reuse it.
+    Shared by the blocking and asyncio verifiers.
+    """
+    key = (domain.lower(), mx_record.lower())
+    with _catch_all_lock:
+        address = _catch_all_probes.get(key)
+        if address is None:
+            random_user = ''.join(random.choices(string.ascii_lowercase + string.digits, k=15))
+            address = _catch_all_probes[key] = f"{random_user}@{domain}"
+        return address
+
+def clear_catch_all_cache():
+    """Forget every cached catch-all result and probe address."""
+    with _catch_all_lock:
+        _catch_all_cache.clear()
+        _catch_all_probes.clear()
+
+def catch_all_from_code(code):
+    """
+    Read the reply to a random-address RCPT: True (catch-all) on 250, False on a 5xx
+    rejection, None for anything else (4xx greylisting, 421) - that settles nothing.
+    """
+    if code == 250:
+        return True
+    if 500 <= code < 600:
+        return False
+    return None
+
+def _probe_catch_all(server, domain, mx_record, sender_email, timings=None):
+    """
+    Send RCPT TO for a made-up local part (see catch_all_probe_address) over an open
+    session and cache a definite result.
+    Raises on SMTP/socket errors so nothing is cached for a failed probe.
+    Returns: (True/False, or None for a temporary reply, reply code)
+    """
+    timings = {} if timings is None else timings
+    _mail(server, sender_email, timings)
+    code, _ = _rcpt(server, mx_record, catch_all_probe_address(domain, mx_record), timings)
+    result = catch_all_from_code(code)
+    if result is not None:
+        _set_cached_catch_all(domain, mx_record, result)
+    return result, code
+
 def is_catch_all(domain, mx_record, sender_email="test@example.com"):
     """
     Check if a domain has a catch-all configuration by testing a random invalid user.
+    The result is cached per (domain, MX) for CATCH_ALL_TTL seconds.
+    Returns: True/False, or None if the server only gave a temporary reply.
     """
-    random_user = ''.join(random.choices(string.ascii_lowercase + string.digits, k=15))
-    test_email = f"{random_user}@{domain}"
-    
+    cached = get_cached_catch_all(domain, mx_record)
+    if cached is not None:
+        return cached
+
     try:
-        server = smtplib.SMTP(timeout=10)
-        server.connect(mx_record, 25)
+        server, host, code, _ = _connect_smtp(_failover_hosts(domain, mx_record))
+        if code != 220:
+            server.quit()
+            return False
         server.helo(server.local_hostname or 'localhost')
-        server.mail(sender_email)
-        code, _ = server.rcpt(test_email)
+        result, _ = _probe_catch_all(server, domain, host, sender_email)
         server.quit()
-        return code == 250
+        return result
     except:
         return False
 
-def extract_text_from_pdf(uploaded_file):
+def extract_text_from_pdf(uploaded_file, max_chars=None, workers=1, timeout=PDF_TIMEOUT):
     """
-    Extract text from a PyPDF2 reader object or stream.
+    Extract text from a PDF upload, stream or file path.
+    Pages stop being read once max_chars characters are extracted, and after timeout
+    seconds whatever was extracted so far is returned. Parsing runs in a child process
+    that is killed at the timeout, so a PDF that hangs the parser holds nothing up.
+    With workers > 1, documents of PDF_PARALLEL_MIN_PAGES pages or more are split
+    across that many processes.
+    Text is cached by a hash of the file's bytes, so the same resume is only parsed once.
+    Returns: The text, or "" if the PDF could not be read.
     """
     try:
-        reader = PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            content = page.extract_text()
-            if content:
-                text += content + "\n"
-        return text.strip()
-    except Exception as e:
+        stream, buffer = _open_pdf(uploaded_file)
+    except (OSError, ValueError) as e:  # ValueError: mmap of an empty file
         logger.error(f"PDF extraction failed: {e}")
         return ""
+    size = len(buffer)
+    key = (hashlib.sha256(buffer).hexdigest(), max_chars)
+    if isinstance(buffer, memoryview):
+        buffer.release()
+
+    cached = None
+    if size > PDF_MAX_BYTES:
+        logger.error(f"PDF extraction skipped: {size} bytes is over the {PDF_MAX_BYTES} byte limit")
+        cached = ""
+    with _pdf_lock:
+        if key in _pdf_text_cache:
+            _pdf_text_cache.move_to_end(key)
+            cached = _pdf_text_cache[key]
+    if cached is not None:
+        if isinstance(stream, mmap.mmap):
+            stream.close()
+        return cached
+
+    try:
+        text, complete = _extract_in_subprocess(stream, max_chars, workers, timeout)
+    finally:
+        if isinstance(stream, mmap.mmap):
+            stream.close()
+    if not complete:
+        return text
+
+    with _pdf_lock:
+        _pdf_text_cache[key] = text
+        while len(_pdf_text_cache) > PDF_CACHE_SIZE:
+            _pdf_text_cache.popitem(last=False)
+    return text
+
+def _open_pdf(source):
+    """
+    Returns: (stream, buffer) over the PDF without copying it. Uploads and BytesIO are
+    read in place and file paths are memory-mapped.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return mapped, mapped
+    if hasattr(source, "getbuffer"):
+        source.seek(0)
+        return source, source.getbuffer()
+    data = source.read()
+    return io.BytesIO(data), data
+
+def _extract_in_subprocess(stream, max_chars, workers, timeout):
+    """
+    Run the page extraction in a child process, collecting page texts as they arrive.
+    After timeout seconds the child and any page workers it started are killed.
+    Returns: (text, complete); text is "" on a parse error and partial on a timeout.
+    """
+    # fork shares the stream with the child without copying or pickling it
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context("spawn")
+        stream.seek(0)
+        stream = io.BytesIO(stream.read())
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_pdf_worker, args=(stream, sender, max_chars, workers))
+    process.start()
+    sender.close()
+
+    parts = []
+    complete = False
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not receiver.poll(remaining):
+                logger.error(f"PDF extraction timed out after {timeout}s; using {len(parts)} pages")
+                return "\n".join(parts).strip()[:max_chars], False
+            kind, value = receiver.recv()
+            if kind == "page":
+                parts.append(value)
+            elif kind == "error":
+                logger.error(f"PDF extraction failed: {value}")
+                return "", False
+            else:
+                complete = True
+                return "\n".join(parts).strip()[:max_chars], True
+    except EOFError:
+        logger.error("PDF extraction failed: the extraction process exited")
+        return "", False
+    finally:
+        receiver.close()
+        _stop_process(process, wait=complete)
+
+def _stop_process(process, wait):
+    # A worker that finished is left a moment to exit; one that timed out is killed at once
+    if wait:
+        process.join(timeout=1)
+    if process.is_alive():
+        try:
+            # The worker leads its own process group, which includes its page workers
+            os.killpg(process.pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            process.kill()
+        process.join()
+
+def _pdf_worker(stream, sender, max_chars, workers):
+    """Child process: send ("page", text) per page, then ("done", None) or ("error", message)."""
+    if hasattr(os, "setsid"):
+        os.setsid()
+    try:
+        for content in _iter_page_texts(stream, max_chars, workers):
+            sender.send(("page", content))
+        sender.send(("done", None))
+    except Exception as e:
+        sender.send(("error", str(e)))
+    finally:
+        sender.close()
+
+def _iter_page_texts(stream, max_chars, workers):
+    """Yield non-empty page texts in page order until the budget or page cap."""
+    from pypdf import PdfReader  # only the Cold Email Drafter needs it
+    reader = PdfReader(stream)
+    pages = len(reader.pages)
+    if pages > PDF_MAX_PAGES:
+        logger.warning(f"PDF has {pages} pages; reading the first {PDF_MAX_PAGES}")
+        pages = PDF_MAX_PAGES
+
+    if workers > 1 and pages >= PDF_PARALLEL_MIN_PAGES:
+        stream.seek(0)
+        contents = _extract_parallel(stream.read(), pages, workers)
+    else:
+        contents = (reader.pages[number].extract_text() for number in range(pages))
+
+    chars = 0
+    for content in contents:
+        if max_chars and chars >= max_chars:
+            break
+        if content:
+            yield content
+            chars += len(content) + 1
+
+def _extract_parallel(data, pages, workers):
+    """Yield page texts in order, with page ranges extracted in a process pool."""
+    step = -(-pages // workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_extract_page_range, data, start, min(start + step, pages))
+                   for start in range(0, pages, step)]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            # Stopping early (budget reached) drops the ranges not started yet
+            for future in futures:
+                future.cancel()
+
+def _extract_page_range(data, start, stop):
+    from pypdf import PdfReader
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[number].extract_text() for number in range(start, stop)]
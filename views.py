@@ -1,10 +1,147 @@
+import hashlib
 import streamlit as st
 import pandas as pd
 import utils
+import drafting
+import greylist
+import jobs
+import mx_health
+import pipeline
+import prefilter
+import rate_limit
+import store
+import timing
 import os
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+
+@st.cache_resource
+def get_result_store():
+    """One SQLite result store shared by every session of the app."""
+    return store.ResultStore()
+
+@st.cache_resource
+def get_draft_cache():
+    """Saved cold email drafts, shared by every session of the app."""
+    return drafting.DraftCache()
+
+@st.cache_resource
+def get_latency_log():
+    """Per-model drafting latencies, shared by every session of the app."""
+    return drafting.LatencyLog()
+
+@st.cache_resource
+def get_job_manager():
+    """Background job pool shared by every session; resumes unfinished jobs on startup."""
+    return jobs.JobManager(result_store=get_result_store())
+
+def render_timing_stats(stats, key):
+    """Expander showing where verification time went, by MX host or domain, with exports."""
+    if not len(stats):
+        return
+    with st.expander("⏱️ Stage timings"):
+        by = st.radio("Group by", ["mx", "domain"], horizontal=True, key=f"timings_by_{key}",
+                      format_func=lambda v: "MX host" if v == "mx" else "Domain")
+        st.dataframe(pd.DataFrame(stats.summary(by=by)), hide_index=True)
+        st.caption(f"{len(stats)} probed addresses, slowest first. Seconds summed per stage; "
+                   "throttle is time spent waiting on provider rate limits.")
+        col1, col2 = st.columns(2)
+        col1.download_button("Download JSON", stats.to_json(), f"timings_{key}.json",
+                             "application/json", key=f"timings_json_{key}")
+        col2.download_button("Download Prometheus", stats.to_prometheus(), f"timings_{key}.prom",
+                             "text/plain", key=f"timings_prom_{key}")
+
+def render_provider_health():
+    """Expander with the live circuit breaker state per MX host and the adaptive rate per provider."""
+    hosts = mx_health.tracker.snapshot()
+    providers = rate_limit.limiter.snapshot()
+    if not hosts and not providers:
+        return
+    with st.expander("🩺 MX health and provider rates"):
+        if hosts:
+            st.dataframe(pd.DataFrame(hosts), hide_index=True)
+        if providers:
+            st.dataframe(pd.DataFrame(providers), hide_index=True)
+        st.caption("Shared by every job and session in this process. An open circuit fast-fails "
+                   "its host; rates are SMTP commands per second and back off on 421 replies and slow connects.")
+
+RESULT_PAGE_SIZES = [50, 100, 500]
+
+@st.cache_resource(max_entries=8)
+def results_page(path, fmt, mtime, size, classes, domain, start, count):
+    """One filtered page of a results file; mtime and size are part of the key so a growing job output is re-read."""
+    return pipeline.results_page(path, fmt, list(classes), domain, start, count)
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def render_results(key, title="Results"):
+    """
+    Filterable, paginated viewer for the results saved in st.session_state[key]:
+    {"path", "fmt", "mime", "file_name"} of an output on disk, or {"df", "file_name"}
+    for a frame from pipeline.prepare_results, plus an optional timing "stats".
+    Only the visible page is styled and sent to the browser; downloads are built on click.
+    """
+    saved = st.session_state.get(key)
+    if not saved:
+        return
+
+    st.subheader(title)
+    col1, col2, col3 = st.columns([2, 2, 1])
+    classes = col1.multiselect("Status", pipeline.STATUS_CLASSES, key=f"{key}_classes")
+    domain = col2.text_input("Domain", key=f"{key}_domain", placeholder="example.com")
+    page_size = col3.selectbox("Rows per page", RESULT_PAGE_SIZES, key=f"{key}_page_size")
+
+    # Files on disk are scanned in chunks and only the visible page is kept
+    if "path" in saved:
+        info = os.stat(saved["path"])
+        def scan(start):
+            return results_page(saved["path"], saved["fmt"], info.st_mtime, info.st_size,
+                                tuple(classes), domain, start, page_size)
+        def filtered_csv():
+            return pipeline.filtered_results_csv(saved["path"], saved["fmt"], classes, domain)
+    else:
+        df = saved["df"]
+        def scan(start):
+            filtered = pipeline.filter_results(df, classes, domain)
+            return filtered.iloc[start:start + page_size], len(filtered), len(df)
+        def filtered_csv():
+            return pipeline.results_csv(pipeline.filter_results(df, classes, domain))
+
+    page_key = f"{key}_page"
+    page = st.session_state.get(page_key, 1)
+    rows, matched, total = scan((page - 1) * page_size)
+    pages = max((matched - 1) // page_size + 1, 1)
+    if page > pages:
+        # The filters shrank the result set
+        st.session_state[page_key] = page = pages
+        rows, matched, total = scan((page - 1) * page_size)
+    if pages > 1:
+        st.number_input("Page", min_value=1, max_value=pages, key=page_key)
+
+    if not matched:
+        st.info("No results match the filters.")
+    else:
+        start = (page - 1) * page_size
+        st.dataframe(pipeline.style_results(rows), hide_index=True)
+        shown = f"Rows {start + 1}–{min(start + page_size, matched)} of {matched}"
+        if matched != total:
+            shown += f" (filtered from {total})"
+        st.caption(shown)
+
+    col1, col2 = st.columns(2)
+    if "path" in saved:
+        col1.download_button(f"Download All ({saved['fmt'].upper()})", lambda: read_file(saved["path"]),
+                             saved["file_name"], saved["mime"], key=f"{key}_download_all")
+    else:
+        col1.download_button("Download All (CSV)", lambda: pipeline.results_csv(df),
+                             saved["file_name"], "text/csv", key=f"{key}_download_all")
+    if matched != total and matched:
+        col2.download_button("Download Filtered (CSV)", filtered_csv,
+                             f"{os.path.splitext(saved['file_name'])[0]}_filtered.csv", "text/csv",
+                             key=f"{key}_download_filtered")
+
+    if saved.get("stats") is not None:
+        render_timing_stats(saved["stats"], key)
 
 def render_permutator_verifier():
     st.title("📧 EmailHunter: Permutation & Verification")
@@ -24,68 +161,96 @@ def render_permutator_verifier():
         if uploaded_file:
             try:
                 if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file)
+                    # Only the header is read here; rows are streamed in chunks below
+                    columns = pipeline.read_csv_columns(uploaded_file)
                 else:
                     st.error("YAML support is limited. Please use CSV for best results.")
-                    df = pd.DataFrame()
+                    columns = []
 
-                # Normalize columns
-                df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
                 required_cols = {'first_name', 'last_name', 'company_domain'}
                 
-                if not required_cols.issubset(set(df.columns)):
-                    st.error(f"Missing required columns. Found: {list(df.columns)}. Expected: First Name, Last Name, Company Domain")
+                if not required_cols.issubset(set(columns)):
+                    st.error(f"Missing required columns. Found: {columns}. Expected: First Name, Last Name, Company Domain")
                 else:
                     st.success("File verify successfully!")
 
+                    find_mode = st.checkbox(
+                        "Find mode: stop at the first valid address per person",
+                        value=True,
+                        key="bulk_find_mode",
+                        help="Tries the patterns that have worked most on each domain first and skips the rest once one is Valid."
+                    )
+                    output_format = st.radio(
+                        "Output format", ["csv", "parquet"], horizontal=True, key="bulk_output_format"
+                    )
+                    retry_greylisted = st.checkbox(
+                        "Retry greylisted addresses (4xx) before finishing",
+                        value=True,
+                        key="bulk_retry_greylisted",
+                        help="Temporary refusals are retried after a backoff while the rest of the list carries on. This can add a few minutes at the end."
+                    )
+
+                    if st.button("Run as Background Job", key="bulk_background"):
+                        job_id = get_job_manager().submit(
+                            jobs.PERMUTATOR, uploaded_file,
+                            {"find_mode": find_mode, "retry_greylisted": retry_greylisted, "fmt": output_format},
+                            name=uploaded_file.name
+                        )
+                        st.success(f"Queued job `{job_id}`. Track it on the Background Jobs page.")
+
                     if st.button("Generate & Verify Emails (Bulk)"):
-                        results = []
+                        # Learns each domain's format so repeat companies are predicted locally
+                        pattern_model = utils.DomainPatternModel(store=get_result_store())
                         progress_bar = st.progress(0)
                         status_text = st.empty()
+                        preview = st.empty()
                         
-                        total_rows = len(df)
+                        total_rows = pipeline.count_csv_rows(uploaded_file)
+                        processed = [0]
                         
-                        for index, row in df.iterrows():
-                            progress = (index + 1) / total_rows
-                            progress_bar.progress(progress)
+                        # Resolve every unique domain up front so dead domains never reach SMTP
+                        status_text.text("Resolving company domains...")
+                        dns_info = pipeline.preresolve_csv(uploaded_file, 'company_domain')
+                        dead_domains = sum(1 for info in dns_info.values() if not info[0])
+                        st.caption(f"Resolved {len(dns_info)} domains, {dead_domains} without MX.")
+                        
+                        def on_row(row):
+                            processed[0] += 1
+                            progress_bar.progress(min(processed[0] / max(total_rows, 1), 1.0))
                             status_text.text(f"Processing {row['first_name']} {row['last_name']}...")
-
-                            permutations = utils.generate_permutations(
-                                row['first_name'], 
-                                row['last_name'], 
-                                row['company_domain']
+                        
+                        retry = greylist.RetryScheduler() if retry_greylisted else None
+                        stats = timing.TimingStats()
+                        
+                        def verify_chunk(chunk):
+                            return pipeline.verify_people_chunk(
+                                chunk, find_mode, pattern_model, get_result_store(), on_row, dns_info, retry,
+                                stats=stats
+                            )
+                        
+                        def retry_rows():
+                            return pipeline.retry_people_rows(
+                                retry, find_mode, pattern_model, get_result_store(), dns_info, stats=stats
+                            )
+                        
+                        with pipeline.ResultWriter("email_hunter_results", output_format) as writer:
+                            # Each chunk goes to disk, and the latest rows are shown as they arrive
+                            pipeline.process_chunks(
+                                pipeline.iter_csv_chunks(uploaded_file), verify_chunk, writer, retry, retry_rows,
+                                after_write=lambda chunk: preview.dataframe(writer.preview_df()),
+                                on_drain=lambda pending: status_text.text(f"Retrying {pending} greylisted people...")
                             )
-                            
-                            for email in permutations:
-                                verification_result = utils.verify_email_smtp(email)
-                                results.append({
-                                    "First Name": row['first_name'],
-                                    "Last Name": row['last_name'],
-                                    "Email": email,
-                                    "Status": verification_result["status"]
-                                })
                                 
                         progress_bar.empty()
                         status_text.text("Processing Complete!")
-                        
-                        results_df = pd.DataFrame(results)
-                        
-                        st.subheader("Results")
-                        def color_status(val):
-                            if val == 'Valid': return 'background-color: #90ee90' # Light green
-                            elif 'Risky' in val: return 'background-color: #ffd700' # Gold
-                            elif 'Invalid': return 'background-color: #ffcccb' # Light red
-                            return ''
-
-                        st.dataframe(results_df.style.map(color_status, subset=['Status']))
-                        
-                        csv = results_df.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            label="Download Results as CSV",
-                            data=csv,
-                            file_name='email_hunter_results.csv',
-                            mime='text/csv',
-                        )
+                        preview.empty()
+                        # Kept in the session so paging and filtering reruns still show the results
+                        st.session_state["permutator_results"] = {
+                            "path": writer.path, "fmt": output_format, "mime": writer.mime,
+                            "file_name": f"email_hunter_results.{output_format}", "stats": stats,
+                        } if writer.rows_written else None
+
+                    render_results("permutator_results")
 
             except Exception as e:
                 st.error(f"An error occurred: {e}")
@@ -104,6 +269,12 @@ def render_permutator_verifier():
         
         edited_df = st.data_editor(people_data, num_rows="dynamic", use_container_width=True)
 
+        d_find_mode = st.checkbox(
+            "Find mode: stop at the first valid address per person",
+            value=True,
+            key="direct_find_mode"
+        )
+
         if st.button("Find Emails"):
             if not d_domain:
                 st.error("Please enter a Company Domain.")
@@ -119,6 +290,8 @@ def render_permutator_verifier():
                 else:
                     with st.spinner(f"Processing {len(valid_people)} people for {d_domain}..."):
                         results = []
+                        # Learns each domain's format so repeat companies are predicted locally
+                        pattern_model = utils.DomainPatternModel(store=get_result_store())
                         progress_bar = st.progress(0)
                         total = len(valid_people)
                         
@@ -126,40 +299,30 @@ def render_permutator_verifier():
                             fn = row['First Name']
                             ln = row['Last Name']
                             
-                            permutations = utils.generate_permutations(fn, ln, d_domain)
+                            # Verify permutations over one SMTP session, most likely pattern first
+                            if d_find_mode:
+                                checked = pattern_model.find_email(fn, ln, d_domain)
+                            else:
+                                checked = utils.find_email(fn, ln, d_domain, stop_on_valid=False, store=get_result_store())
                             
-                            # Verify each
-                            for email in permutations:
-                                verification_result = utils.verify_email_smtp(email)
+                            for email, verification_result in checked:
                                 results.append({
                                     "First Name": fn,
                                     "Last Name": ln,
                                     "Email": email,
-                                    "Status": verification_result["status"]
+                                    "Status": verification_result["status"],
+                                    "Confidence": verification_result.get("confidence")
                                 })
                             
                             progress_bar.progress((i + 1) / total)
                         
                         progress_bar.empty()
-                        results_df = pd.DataFrame(results)
-                        
-                        st.subheader("Results")
-                        def color_status(val):
-                            if val == 'Valid': return 'background-color: #90ee90'
-                            elif 'Risky' in val: return 'background-color: #ffd700'
-                            elif 'Invalid': return 'background-color: #ffcccb'
-                            return ''
-                        
-                        st.dataframe(results_df.style.map(color_status, subset=['Status']))
-                        
-                        # Download Button for Direct Input results
-                        csv_direct = results_df.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            label="Download Results as CSV",
-                            data=csv_direct,
-                            file_name='email_hunter_direct_results.csv',
-                            mime='text/csv',
-                        )
+                        st.session_state["direct_results"] = {
+                            "df": pipeline.prepare_results(pd.DataFrame(results)),
+                            "file_name": "email_hunter_direct_results.csv",
+                        } if results else None
+
+        render_results("direct_results")
 
     # --- TAB 3: Email Checker ---
     with tab3:
@@ -173,7 +336,7 @@ def render_permutator_verifier():
                 st.error("Invalid email format.")
             else:
                 with st.spinner("Verifying..."):
-                    details = utils.verify_email_smtp(check_email)
+                    details = utils.verify_email_smtp(check_email, store=get_result_store())
                     status = details["status"]
                     
                     st.subheader("Verification Status")
@@ -215,13 +378,17 @@ def render_cold_email_drafter(llm_provider, api_key, selected_model):
         st.warning(f"⚠️ Please provide a {llm_provider} API Key in the sidebar to use the AI features.")
         st.stop()
 
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("1. Your Info")
-        resume_pdf = st.file_uploader("Upload Resume (PDF)", type=['pdf'])
-        
-    with col2:
+    st.subheader("1. Your Info")
+    resume_pdf = st.file_uploader("Upload Resume (PDF)", type=['pdf'])
+
+    use_cache = st.checkbox("Reuse a saved draft for identical inputs", value=True,
+                            help="Untick to regenerate a fresh draft for the same resume and context; "
+                                 "the new draft replaces the saved one.")
+
+    tab1, tab2 = st.tabs(["✉️ Single Draft", "📑 Batch Drafts"])
+
+    # --- TAB 1: One company context ---
+    with tab1:
         st.subheader("2. Target Context")
         company_context = st.text_area(
             "Company Description or Job Post",
@@ -229,80 +396,114 @@ def render_cold_email_drafter(llm_provider, api_key, selected_model):
             placeholder="Paste the job description or 'About Us' page content here..."
         )
 
-    if st.button("Generate Cold Email"):
-        if not resume_pdf or not company_context:
-            st.error("Please upload a resume and provide company context.")
-        else:
-            with st.spinner("Analyzing resume and drafting email..."):
+        if st.button("Generate Cold Email"):
+            if not resume_pdf or not company_context:
+                st.error("Please upload a resume and provide company context.")
+            else:
                 try:
-                    # 1. Parse Resume
-                    resume_text = utils.extract_text_from_pdf(resume_pdf)
+                    # 1. Parse Resume (cached by file hash)
+                    with st.spinner("Analyzing resume..."):
+                        resume_text = utils.extract_text_from_pdf(resume_pdf, max_chars=drafting.RESUME_EXTRACT_CHARS)
                     # st.write(resume_text) # Optional: Debug output
                     if not resume_text:
                         st.error("Could not extract text from PDF. Is it a scanned image?")
                         st.stop()
-                    
-                    # 2. Setup LangChain
-                    if llm_provider == "OpenAI":
-                        llm = ChatOpenAI(
-                            temperature=0.7,
-                            model_name=selected_model,
-                            openai_api_key=api_key
-                        )
-                    elif llm_provider == "Groq":
-                        from langchain_groq import ChatGroq
-                        llm = ChatGroq(
-                            temperature=0.7,
-                            model_name=selected_model, 
-                            groq_api_key=api_key
-                        )
-                    
-                    prompt = PromptTemplate.from_template(
-                        """
-                        You are a world-class cold outreach expert and copywriter.
-                        
-                        GOAL: Write a high-converting, personalized cold email to a recruiter or hiring manager at the target company.
-                        
-                        CONTEXT:
-                        My Resume:
-                        {resume_text}
-                        
-                        Target Company/Job Context:
-                        {company_context}
-                        
-                        INSTRUCTIONS:
-                        1. Analyze the resume to find the most relevant skills/experience for this specific company context.
-                        2. Keep the email concise (under 200 words).
-                        3. Use a professional but engaging tone.
-                        4. Focus on value proposition: matches between my skills and their needs.
-                        5. Include a strong Call to Action (CTA).
-                        6. Output ONLY the email body (and subject line).
-                        """
-                    )
-                    
-                    chain = prompt | llm | StrOutputParser()
-                    
-                    response = chain.invoke({
-                        "resume_text": resume_text[:4000], # Truncate to avoid context limits if huge
-                        "company_context": company_context
-                    })
-                    
+
+                    # 2. Stream the draft from a pooled LangChain chain, or reuse a saved draft
                     st.subheader("Drafted Email")
-                    st.text_area("Copy your email:", value=response, height=400)
+                    output = st.empty()
+                    with output.container():
+                        response = st.write_stream(drafting.stream_draft(
+                            resume_text, company_context, llm_provider, selected_model, api_key,
+                            cache=get_draft_cache(), refresh=not use_cache,
+                            latency_log=get_latency_log()
+                        ))
+                    output.text_area("Copy your email:", value=response, height=400)
                     
                 except Exception as e:
                     st.error(f"Error generating email: {e}")
 
+        latency = get_latency_log().summary()
+        if latency:
+            with st.expander("⏱️ Model latency (streamed drafts)"):
+                st.dataframe(pd.DataFrame(latency), use_container_width=True, hide_index=True)
+
+    # --- TAB 2: A CSV of targets ---
+    with tab2:
+        st.markdown("Upload a CSV with one target per row, e.g. columns `Company` and `Job Post`.")
+        targets_file = st.file_uploader("Upload Targets CSV", type=['csv'], key="draft_targets")
+        if targets_file:
+            try:
+                targets_df = pd.read_csv(targets_file)
+            except Exception as e:
+                st.error(f"Error reading CSV: {e}")
+                st.stop()
+            columns = list(targets_df.columns)
+            context_col = st.selectbox("Context column (job post or company description)", columns,
+                                       index=len(columns) - 1)
+            name_col = st.selectbox("Company name column", ["(none)"] + columns)
+            c1, c2 = st.columns(2)
+            concurrency = c1.slider("Concurrent requests", 1, 16, drafting.BATCH_CONCURRENCY)
+            requests_per_minute = c2.number_input("Max requests per minute", 1, 1000,
+                                                  drafting.BATCH_REQUESTS_PER_MINUTE)
+
+            # Finished rows survive reruns, so a retry only redoes the failures. A different
+            # resume, targets file, column or model starts a fresh batch.
+            resume_hash = hashlib.sha256(resume_pdf.getvalue()).hexdigest() if resume_pdf else None
+            batch_key = (targets_file.name, targets_file.size, context_col, resume_hash,
+                         llm_provider, selected_model, drafting.DEFAULT_TEMPERATURE)
+            batch = st.session_state.get("draft_batch")
+            if batch is None or batch["key"] != batch_key:
+                batch = st.session_state["draft_batch"] = {"key": batch_key, "rows": {}}
+            failed = [i for i, row in batch["rows"].items() if row["Status"] == "Failed"]
+
+            b1, b2 = st.columns(2)
+            run_all = b1.button("Draft All Emails")
+            run_failed = b2.button(f"Retry {len(failed)} Failed Rows", disabled=not failed)
+
+            if run_all or run_failed:
+                if not resume_pdf:
+                    st.error("Please upload a resume first.")
+                    st.stop()
+                resume_text = utils.extract_text_from_pdf(resume_pdf, max_chars=drafting.RESUME_EXTRACT_CHARS)
+                if not resume_text:
+                    st.error("Could not extract text from PDF. Is it a scanned image?")
+                    st.stop()
+
+                indexes = failed if run_failed else [i for i in targets_df.index if i not in batch["rows"]
+                                                     or batch["rows"][i]["Status"] == "Failed"]
+                targets = [(i, str(targets_df.at[i, context_col])) for i in indexes]
+                progress_bar = st.progress(0)
+                table = st.empty()
+                for done, (i, draft, cached, error) in enumerate(drafting.iter_drafts(
+                    resume_text, targets, llm_provider, selected_model, api_key, concurrency,
+                    requests_per_minute, cache=get_draft_cache(), refresh=not use_cache
+                ), start=1):
+                    batch["rows"][i] = {
+                        "Row ID": i,
+                        "Company": targets_df.at[i, name_col] if name_col != "(none)" else "",
+                        "Status": "Failed" if error else ("Cached" if cached else "Drafted"),
+                        "Draft": draft or "",
+                        "Error": error or "",
+                    }
+                    progress_bar.progress(done / max(len(targets), 1))
+                    table.dataframe(pd.DataFrame(batch["rows"].values()), use_container_width=True)
+                progress_bar.empty()
+                table.empty()
+                failed = [i for i, row in batch["rows"].items() if row["Status"] == "Failed"]
+                if failed:
+                    st.warning(f"{len(failed)} rows failed. Retry them to redo only those rows.")
+
+            if batch["rows"]:
+                results_df = pd.DataFrame(sorted(batch["rows"].values(), key=lambda r: r["Row ID"]))
+                st.dataframe(results_df, use_container_width=True)
+                st.download_button("Download Drafts", results_df.to_csv(index=False).encode('utf-8'),
+                                   "cold_email_drafts.csv", "text/csv")
+
 def render_email_validator():
     st.title("🛡️ Bulk Email Validator")
     st.markdown("Check whether a list of emails are valid, risky, or invalid.")
-    
-    # helper for color
-    def color_status(val):
-        if val == 'Valid': return 'background-color: #90ee90'
-        elif 'Risky' in val: return 'background-color: #ffd700'
-        elif 'Invalid': return 'background-color: #ffcccb'
-        return ''
+
 
     tab1, tab2 = st.tabs(["📂 Bulk CSV Upload", "👤 Manual Entry"])
 
@@ -313,12 +514,11 @@ def render_email_validator():
 
         if uploaded_file:
             try:
-                df = pd.read_csv(uploaded_file)
-                # Normalize headers
-                df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+                # Only the header is read here; rows are streamed in chunks below
+                columns = pipeline.read_csv_columns(uploaded_file)
                 
                 # Identify email column
-                possible_email_cols = [c for c in df.columns if 'email' in c or 'mail' in c]
+                possible_email_cols = [c for c in columns if 'email' in c or 'mail' in c]
                 email_col = None
                 
                 if len(possible_email_cols) == 1:
@@ -328,34 +528,76 @@ def render_email_validator():
                     email_col = st.selectbox("Select the column containing emails:", possible_email_cols)
                 else:
                     st.warning("No column labeled 'email' found. Please select one manually:")
-                    email_col = st.selectbox("Select Email Column", df.columns)
+                    email_col = st.selectbox("Select Email Column", columns)
+                
+                output_format = st.radio(
+                    "Output format", ["csv", "parquet"], horizontal=True, key="validator_output_format"
+                )
+                retry_greylisted = st.checkbox(
+                    "Retry greylisted addresses (4xx) before finishing",
+                    value=True,
+                    key="validator_retry_greylisted",
+                    help="Temporary refusals are retried after a backoff while the rest of the list carries on. This can add a few minutes at the end."
+                )
+                
+                if st.button("Run as Background Job", key="validator_background"):
+                    job_id = get_job_manager().submit(
+                        jobs.VALIDATOR, uploaded_file,
+                        {"email_col": email_col, "retry_greylisted": retry_greylisted, "fmt": output_format},
+                        name=uploaded_file.name
+                    )
+                    st.success(f"Queued job `{job_id}`. Track it on the Background Jobs page.")
                 
                 if st.button("Validate Emails (CSV)"):
-                    results = []
                     progress_bar = st.progress(0)
-                    total_rows = len(df)
+                    status_text = st.empty()
+                    preview = st.empty()
+                    total_rows = pipeline.count_csv_rows(uploaded_file)
+                    processed = [0]
                     
-                    for index, row in df.iterrows():
-                        email = str(row[email_col]).strip()
-                        details = utils.verify_email_smtp(email)
-                        
-                        results.append({
-                            "Original Row ID": index,
-                            "Email": email,
-                            "Status": details['status'],
-                            "Reason": details['reason'],
-                            "Provider": "Free" if details['is_free_provider'] else "Business"
-                        })
-                        progress_bar.progress((index + 1) / total_rows)
+                    # Resolve every unique domain up front so dead domains never reach SMTP
+                    with st.spinner("Resolving email domains..."):
+                        dns_info = pipeline.preresolve_csv(uploaded_file, email_col)
+                    dead_domains = sum(1 for info in dns_info.values() if not info[0])
+                    st.caption(f"Resolved {len(dns_info)} domains, {dead_domains} without MX.")
                     
-                    progress_bar.empty()
-                    results_df = pd.DataFrame(results)
-                    st.subheader("Validation Results")
-                    st.dataframe(results_df.style.map(color_status, subset=['Status']))
+                    retry = greylist.RetryScheduler() if retry_greylisted else None
+                    stats = timing.TimingStats()
+                    
+                    def verify_chunk(chunk):
+                        # Verify the chunk concurrently, capped per MX host
+                        done = []
+                        def on_result(email, details):
+                            done.append(email)
+                            progress_bar.progress(min((processed[0] + len(done)) / max(total_rows, 1), 1.0))
+                        results = pipeline.verify_email_chunk(
+                            chunk, email_col, store=get_result_store(), on_result=on_result,
+                            dns_info=dns_info, retry=retry, stats=stats
+                        )
+                        processed[0] += len(chunk)
+                        return results
+                    
+                    def retry_rows():
+                        return pipeline.retry_email_rows(retry, get_result_store(), dns_info, stats=stats)
                     
-                    # Download CSV
-                    csv_data = results_df.to_csv(index=False).encode('utf-8')
-                    st.download_button("Download Logic Results", csv_data, "bulk_validation.csv", "text/csv")
+                    with pipeline.ResultWriter("bulk_validation", output_format) as writer:
+                        # Each chunk goes to disk, and the latest rows are shown as they arrive
+                        pipeline.process_chunks(
+                            pipeline.iter_csv_chunks(uploaded_file), verify_chunk, writer, retry, retry_rows,
+                            after_write=lambda chunk: preview.dataframe(writer.preview_df()),
+                            on_drain=lambda pending: status_text.text(f"Retrying {pending} greylisted addresses...")
+                        )
+                    
+                    progress_bar.empty()
+                    status_text.empty()
+                    preview.empty()
+                    # Kept in the session so paging and filtering reruns still show the results
+                    st.session_state["validator_results"] = {
+                        "path": writer.path, "fmt": output_format, "mime": writer.mime,
+                        "file_name": f"bulk_validation.{output_format}", "stats": stats,
+                    } if writer.rows_written else None
+
+                render_results("validator_results", "Validation Results")
                     
             except Exception as e:
                 st.error(f"Error processing CSV: {e}")
@@ -377,24 +619,82 @@ def render_email_validator():
                 if not emails:
                     st.error("No valid emails found in input.")
                 else:
-                    st.info(f"Found {len(emails)} emails. Validating...")
+                    # Malformed, duplicate and disposable entries are settled before any network work
+                    checks = prefilter.check(emails)
+                    decided = checks["status"].notna()
+                    to_verify = checks.loc[~decided, "canonical"].nunique()
+                    st.info(f"Found {len(emails)} emails, {decided.sum()} settled locally and "
+                            f"{to_verify} unique addresses to check. Validating...")
                     results = []
                     progress_bar = st.progress(0)
-                    total = len(emails)
+                    total = to_verify + checks.loc[decided, "email"].nunique()
                     
-                    for i, email in enumerate(emails):
-                        details = utils.verify_email_smtp(email)
+                    done = []
+                    def on_result(email, details):
+                        done.append(email)
+                        progress_bar.progress(min(len(done) / total, 1.0))
+                    verified = pipeline.verify_addresses(checks, get_result_store(), on_result)
+                    
+                    for email in emails:
+                        details = verified[email]
                         results.append({
                             "Email": email,
                             "Status": details['status'],
                             "Reason": details['reason']
                         })
-                        progress_bar.progress((i + 1) / total)
                     
                     progress_bar.empty()
-                    results_df = pd.DataFrame(results)
-                    st.subheader("Validation Results")
-                    st.dataframe(results_df.style.map(color_status, subset=['Status']))
-                    
-                    csv_data = results_df.to_csv(index=False).encode('utf-8')
-                    st.download_button("Download Results", csv_data, "manual_validation.csv", "text/csv")
+                    st.session_state["manual_results"] = {
+                        "df": pipeline.prepare_results(pd.DataFrame(results)),
+                        "file_name": "manual_validation.csv",
+                    }
+
+        render_results("manual_results", "Validation Results")
+
+def render_jobs():
+    st.title("⏳ Background Jobs")
+    st.markdown("Bulk jobs keep running across reruns and refreshes, and resume from their last checkpoint after a restart.")
+
+    manager = get_job_manager()
+    if st.button("🔄 Refresh"):
+        st.rerun()
+    render_provider_health()
+
+    job_list = manager.list_jobs()
+    if not job_list:
+        st.info("No jobs yet. Queue one from the Permutator or Validator bulk upload tabs.")
+        return
+
+    for job in job_list:
+        with st.container(border=True):
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.markdown(f"**{job['name'] or job['id']}** · {job['kind']} · `{job['id']}`")
+                st.progress(job["progress"], text=f"{job['status']} — {job['rows_done']} / {job['total_rows']} rows")
+                if job["error"]:
+                    st.error(job["error"])
+            viewing = False
+            with col2:
+                if job["status"] in jobs.ACTIVE_STATUSES:
+                    if st.button("Cancel", key=f"cancel_{job['id']}"):
+                        manager.cancel(job["id"])
+                        st.rerun()
+                # Jobs write CSV and switch output_path to .parquet once converted
+                fmt = "parquet" if job["output_path"].endswith(".parquet") else "csv"
+                mime = "application/octet-stream" if fmt == "parquet" else "text/csv"
+                file_name = f"{job['kind']}_{job['id']}.{fmt}"
+                if os.path.exists(job["output_path"]) and os.path.getsize(job["output_path"]):
+                    # Read only when clicked, not on every refresh of this page
+                    st.download_button(
+                        "Download", lambda path=job["output_path"]: read_file(path),
+                        file_name, mime, key=f"download_{job['id']}"
+                    )
+                    viewing = st.toggle("View results", key=f"view_{job['id']}")
+            if viewing:
+                st.session_state[f"job_results_{job['id']}"] = {
+                    "path": job["output_path"], "fmt": fmt, "mime": mime,
+                    "file_name": file_name, "stats": manager.timings(job["id"]),
+                }
+                render_results(f"job_results_{job['id']}")
+            else:
+                render_timing_stats(manager.timings(job["id"]), job["id"])